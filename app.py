@@ -4,17 +4,17 @@ OWL-ViT Streamlit Application
 """
 
 import streamlit as st
-import torch
 from PIL import Image
 from typing import Optional, List
 
 # カスタムモジュールのインポート
-from image_processor import ImageVisualizer
+from image_processor import ImageVisualizer, ImagePreprocessor
 from model_manager import (
     ModelLoader, TextQueryProcessor, DetectionProcessor, 
     ImageGuidedDetectionProcessor
 )
 from ui_components import SidebarManager, InputManager, ResultsManager
+from translator import JapaneseTranslator
 from visualization import FlowVisualizationManager
 
 
@@ -26,6 +26,7 @@ class OWLViTApp:
         self.setup_page_config()
         self.model = None
         self.processor = None
+        self.model_name = None
     
     def setup_page_config(self) -> None:
         """ページ設定を行います"""
@@ -86,21 +87,88 @@ class OWLViTApp:
         Returns:
             初期化が成功した場合True
         """
-        if self.model is None or self.processor is None:
-            self.model, self.processor = ModelLoader.load_model_and_processor(model_name)
-            
+        # st.cache_resourceによりモデル名ごとにプロセス内で共有されるため、
+        # 再実行時はキャッシュから取得されるだけでコストはかからない
+        self.model, self.processor = ModelLoader.load_model_and_processor(model_name)
+        self.model_name = model_name
+        
         if self.model is None or self.processor is None:
             st.error("モデルの初期化に失敗しました")
             return False
         
         return True
     
+    @staticmethod
+    def _create_display_labels(text_queries: List[str]) -> List[str]:
+        """
+        クエリごとの表示ラベルを作成します
+        
+        Args:
+            text_queries: 元のテキストクエリのリスト
+            
+        Returns:
+            日本語クエリには英訳を併記した表示ラベルのリスト
+        """
+        display_labels = []
+        for original_query in text_queries:
+            # 翻訳情報を追加
+            if JapaneseTranslator.is_japanese(original_query):
+                english_translation = JapaneseTranslator.translate_japanese_to_english(original_query)
+                if english_translation != original_query:
+                    display_labels.append(f"{original_query}({english_translation})")
+                else:
+                    display_labels.append(original_query)
+            else:
+                display_labels.append(original_query)
+        return display_labels
+    
+    def run_batch_text_guided_detection(
+        self,
+        images: List[Image.Image],
+        text_queries: List[str],
+        confidence_threshold: float,
+        translation_method: str = "辞書翻訳のみ"
+    ) -> List[Optional[Image.Image]]:
+        """
+        複数の画像に対してテキストガイド検出を一括で実行します
+        
+        Args:
+            images: 入力画像のリスト
+            text_queries: テキストクエリのリスト
+            confidence_threshold: 信頼度閾値
+            translation_method: 翻訳方法
+            
+        Returns:
+            画像ごとの可視化された結果画像のリスト、検出がない・失敗した画像はNone
+        """
+        formatted_queries = TextQueryProcessor.format_text_queries(text_queries, translation_method)
+        batch_results = DetectionProcessor.run_batch_detection(
+            self.model, self.processor, images, formatted_queries[0], confidence_threshold
+        )
+        
+        display_labels = self._create_display_labels(text_queries)
+        visualized_images = []
+        for image, results in zip(images, batch_results):
+            if not results or len(results[0]["boxes"]) == 0:
+                visualized_images.append(None)
+                continue
+            result = results[0]
+            labels = [
+                display_labels[label_idx] if label_idx < len(display_labels) else "unknown"
+                for label_idx in result["labels"].tolist()
+            ]
+            visualized_images.append(ImageVisualizer.create_detection_visualization(
+                image, result["boxes"].numpy(), result["scores"].numpy(), labels, confidence_threshold
+            ))
+        return visualized_images
+    
     def run_text_guided_detection(
         self,
         image: Image.Image,
         text_queries: List[str],
         confidence_threshold: float,
-        translation_method: str = "辞書翻訳のみ"
+        translation_method: str = "辞書翻訳のみ",
+        force_recompute: bool = False
     ) -> Optional[Image.Image]:
         """
         テキストガイド検出を実行します
@@ -109,12 +177,15 @@ class OWLViTApp:
             image: 入力画像
             text_queries: テキストクエリのリスト
             confidence_threshold: 信頼度閾値
+            translation_method: 翻訳方法
+            force_recompute: Trueの場合は前回の推論結果を再利用しない
             
         Returns:
             可視化された結果画像、失敗時はNone
         """
         try:
-            from translator import JapaneseTranslator
+            # 座標と可視化は元画像を使用（モデル入力へのリサイズはprepare_inputsで行う）
+            image = ImagePreprocessor.convert_to_rgb(image)
             
             # デバッグ情報の表示
             st.subheader("🔍 検出プロセス")
@@ -124,23 +195,40 @@ class OWLViTApp:
             
             # 使用されるクエリを表示
             st.write("**使用されるクエリ:**")
-            for i, query_list in enumerate(formatted_queries):
-                st.write(f"クエリ {i+1}: {', '.join(query_list)}")
+            for i, query in enumerate(formatted_queries[0]):
+                st.write(f"クエリ {i+1}: {query}")
             
-            # 入力の準備
+            # 入力の準備（モデルと同じデバイス・型に転送）
+            # 画像キーは前処理のキャッシュと推論結果の再利用の両方で使うため一度だけ計算する
+            device = ModelLoader.get_device(self.model)
+            image_key = DetectionProcessor.compute_image_key(image)
             inputs = DetectionProcessor.prepare_inputs(
-                self.processor, image, formatted_queries
+                self.processor, image, formatted_queries,
+                device, ModelLoader.get_dtype(self.model), image_key
             )
             if inputs is None:
                 return None
             
-            # 推論の実行
-            outputs = DetectionProcessor.run_inference(self.model, inputs)
+            # テキスト埋め込みはモデル名・クエリが同じ間はキャッシュを再利用
+            text_embeds = TextQueryProcessor.encode_text_queries(
+                self.model, self.processor, self.model_name,
+                tuple(formatted_queries[0])
+            )
+            
+            # 推論の実行（モデル・クエリ・画像が前回と同じなら前回の結果を再利用）
+            cache_key = (
+                self.model_name,
+                tuple(formatted_queries[0]),
+                image_key
+            )
+            outputs = DetectionProcessor.run_inference(
+                self.model, inputs, text_embeds, cache_key, force_recompute
+            )
             if outputs is None:
                 return None
             
             # 結果の後処理（より低い信頼度閾値で試行）
-            target_sizes = torch.tensor([image.size[::-1]])
+            target_sizes = DetectionProcessor.get_target_sizes(image, device)
             
             # より低い信頼度閾値で試行
             thresholds_to_try = [
@@ -155,19 +243,34 @@ class OWLViTApp:
             results = None
             successful_threshold = None
             
-            st.write("**🎯 信頼度閾値の調整を試行中...**")
+            # 最も低い閾値で一度だけ後処理し、各閾値ではスコアで絞り込む
+            all_results = DetectionProcessor.post_process_results(
+                self.processor, outputs, target_sizes, min(thresholds_to_try)
+            )
+            if all_results is None:
+                return None
+            all_results = DetectionProcessor.move_results_to_cpu(all_results)
+            max_score = max(
+                (result["scores"].max().item() for result in all_results if len(result["scores"]) > 0),
+                default=None
+            )
+            
+            # 閾値ごとのログはまとめて一度だけ表示する
+            debug_lines = ["🎯 信頼度閾値の調整を試行中..."]
             
             for threshold in thresholds_to_try:
-                st.write(f"- 閾値 {threshold:.3f} を試行中...")
-                results = DetectionProcessor.post_process_results(
-                    self.processor, outputs, target_sizes, threshold
-                )
-                if results and any(len(result["boxes"]) > 0 for result in results):
+                debug_lines.append(f"- 閾値 {threshold:.3f} を試行中...")
+                if max_score is not None and max_score > threshold:
+                    results = DetectionProcessor.filter_results_by_threshold(all_results, threshold)
                     successful_threshold = threshold
-                    st.success(f"✅ 信頼度閾値 {threshold:.3f} で検出に成功しました")
                     break
                 else:
-                    st.write(f"  ❌ 閾値 {threshold:.3f} では検出なし")
+                    debug_lines.append(f"  ❌ 閾値 {threshold:.3f} では検出なし")
+            
+            if st.session_state.get('debug_mode', False):
+                st.expander("detection log").code("\n".join(debug_lines))
+            if successful_threshold is not None:
+                st.success(f"✅ 信頼度閾値 {successful_threshold:.3f} で検出に成功しました")
             
             if results is None or not any(len(result["boxes"]) > 0 for result in results):
                 st.warning("⚠️ すべての閾値で検出結果がありませんでした。")
@@ -189,25 +292,17 @@ class OWLViTApp:
             # 可視化画像の作成
             if results and len(results) > 0:
                 result = results[0]  # 最初の結果を使用
-                boxes = result["boxes"].tolist()
-                scores = result["scores"].tolist()
+                boxes = result["boxes"].detach().cpu().numpy()
+                scores = result["scores"].detach().cpu().numpy()
+                
+                # クエリごとの表示ラベルを先に作成（翻訳はクエリ数分のみ）
+                display_labels = self._create_display_labels(text_queries)
                 
                 # ラベルの取得（翻訳情報を含む）
-                labels = []
-                for label_idx in result["labels"].tolist():
-                    if label_idx < len(text_queries):
-                        original_query = text_queries[label_idx]
-                        # 翻訳情報を追加
-                        if JapaneseTranslator.is_japanese(original_query):
-                            english_translation = JapaneseTranslator.translate_japanese_to_english(original_query)
-                            if english_translation != original_query:
-                                labels.append(f"{original_query}({english_translation})")
-                            else:
-                                labels.append(original_query)
-                        else:
-                            labels.append(original_query)
-                    else:
-                        labels.append("unknown")
+                labels = [
+                    display_labels[label_idx] if label_idx < len(display_labels) else "unknown"
+                    for label_idx in result["labels"].tolist()
+                ]
                 
                 # 検出結果がある場合のみ可視化
                 if len(boxes) > 0:
@@ -223,16 +318,18 @@ class OWLViTApp:
             
         except Exception as e:
             st.error(f"テキストガイド検出の実行中にエラーが発生しました: {e}")
-            if st.session_state.get('debug_mode', True):
-                st.write("**🔍 エラーの詳細情報:**")
-                st.write(f"- エラータイプ: {type(e).__name__}")
-                st.write(f"- エラーメッセージ: {str(e)}")
-                st.write(f"- テキストクエリ数: {len(text_queries)}")
-                st.write(f"- 画像サイズ: {image.size}")
-                st.write("**💡 解決策のヒント:**")
-                st.write("- テキストクエリの数を減らしてみてください")
-                st.write("- より簡単なクエリを試してください")
-                st.write("- 画像のサイズを小さくしてみてください")
+            if st.session_state.get('debug_mode', False):
+                st.code("\n".join([
+                    "🔍 エラーの詳細情報:",
+                    f"- エラータイプ: {type(e).__name__}",
+                    f"- エラーメッセージ: {str(e)}",
+                    f"- テキストクエリ数: {len(text_queries)}",
+                    f"- 画像サイズ: {image.size}",
+                    "💡 解決策のヒント:",
+                    "- テキストクエリの数を減らしてみてください",
+                    "- より簡単なクエリを試してください",
+                    "- 画像のサイズを小さくしてみてください"
+                ]))
             return None
     
     def run_image_guided_detection(
@@ -255,6 +352,9 @@ class OWLViTApp:
             可視化された結果画像、失敗時はNone
         """
         try:
+            # 座標と可視化は元画像を使用（モデル入力へのリサイズは入力準備で行う）
+            image = ImagePreprocessor.convert_to_rgb(image)
+            
             # 入力の準備
             inputs = ImageGuidedDetectionProcessor.prepare_image_guided_inputs(
                 self.processor, image, query_image
@@ -263,6 +363,10 @@ class OWLViTApp:
                 return None
             
             # 推論の実行
+            device = ModelLoader.get_device(self.model)
+            inputs = DetectionProcessor.move_inputs_to_device(
+                inputs, device, ModelLoader.get_dtype(self.model)
+            )
             outputs = ImageGuidedDetectionProcessor.run_image_guided_inference(
                 self.model, inputs
             )
@@ -270,12 +374,13 @@ class OWLViTApp:
                 return None
             
             # 結果の後処理
-            target_sizes = torch.tensor([image.size[::-1]])
+            target_sizes = DetectionProcessor.get_target_sizes(image, device)
             results = ImageGuidedDetectionProcessor.post_process_image_guided_results(
                 self.processor, outputs, target_sizes, confidence_threshold, nms_threshold
             )
             if results is None:
                 return None
+            results = DetectionProcessor.move_results_to_cpu(results)
             
             # 結果の表示
             ResultsManager.display_image_guided_results(results, confidence_threshold)
@@ -283,8 +388,8 @@ class OWLViTApp:
             # 可視化画像の作成
             if results and len(results) > 0:
                 result = results[0]  # 最初の結果を使用
-                boxes = result["boxes"].tolist()
-                scores = result["scores"].tolist()
+                boxes = result["boxes"].detach().cpu().numpy()
+                scores = result["scores"].detach().cpu().numpy()
                 labels = ["similar object"] * len(boxes)  # 画像ガイド検出ではラベルは固定
                 
                 visualized_image = ImageVisualizer.create_detection_visualization(
@@ -340,6 +445,7 @@ class OWLViTApp:
                     )
                     
                     if visualized_image:
+                        ResultsManager.start_png_encode(visualized_image)
                         st.image(visualized_image, caption="検出結果", use_container_width=True)
                         ResultsManager.create_download_section(visualized_image)
                     else:
@@ -353,16 +459,38 @@ class OWLViTApp:
             
             text_queries, translation_method = result
             
-            # 検出実行ボタン
-            if st.button("🔍 物体検出を実行", type="primary"):
+            # 検出実行ボタン（同じ入力では前回の推論結果を再利用、再計算ボタンで強制的に推論）
+            run_col, rerun_col = st.columns([1, 1])
+            with run_col:
+                run_clicked = st.button("🔍 物体検出を実行", type="primary")
+            with rerun_col:
+                rerun_clicked = st.button("🔄 推論を再計算して実行")
+            
+            if run_clicked or rerun_clicked:
                 with st.spinner("物体検出を実行中..."):
                     visualized_image = self.run_text_guided_detection(
-                        image, text_queries, confidence_threshold, translation_method
+                        image, text_queries, confidence_threshold, translation_method,
+                        force_recompute=rerun_clicked
                     )
                     
                     if visualized_image:
+                        ResultsManager.start_png_encode(visualized_image)
                         st.image(visualized_image, caption="検出結果", use_container_width=True)
                         ResultsManager.create_download_section(visualized_image)
+            
+            # 同じクエリで複数の画像をまとめて検出（前処理と推論を重ねて実行）
+            with st.expander("📚 複数画像で一括検出"):
+                batch_images = InputManager.create_batch_image_section()
+                if batch_images and st.button("🔍 一括検出を実行"):
+                    with st.spinner(f"{len(batch_images)}枚の画像で物体検出を実行中..."):
+                        visualized_images = self.run_batch_text_guided_detection(
+                            batch_images, text_queries, confidence_threshold, translation_method
+                        )
+                    for i, visualized_image in enumerate(visualized_images):
+                        if visualized_image:
+                            st.image(visualized_image, caption=f"検出結果 {i+1}", use_container_width=True)
+                        else:
+                            st.info(f"画像 {i+1} では検出結果がありませんでした")
         
         elif detection_mode == "画像ガイド検出":
             query_image = InputManager.create_query_image_section()
@@ -378,6 +506,7 @@ class OWLViTApp:
                     )
                     
                     if visualized_image:
+                        ResultsManager.start_png_encode(visualized_image)
                         st.image(visualized_image, caption="検出結果", use_container_width=True)
                         ResultsManager.create_download_section(visualized_image)
         
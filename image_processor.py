@@ -4,15 +4,97 @@
 """
 
 import requests
+from io import BytesIO
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional, Tuple, List
-from PIL import Image
+from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 import streamlit as st
 
 
+# 画像の取得元（Unsplash、COCO）への接続を使い回し、取得ごとのTCP/TLSハンドシェイクを省く
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=4, pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.3)
+)
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
+
+# 画像取得のタイムアウト（接続, 読み込み）
+_FETCH_TIMEOUT = (3.05, 10)
+
+# URL画像をデコードする際の下限サイズ（モデルの入力サイズより十分大きい）
+_DRAFT_SIZE = (1024, 1024)
+
+# 検出ラベル描画用のフォント（呼び出しごとの読み込みを避ける）
+_LABEL_FONT = ImageFont.load_default()
+
+
 class ImageLoader:
     """画像の読み込みを担当するクラス"""
     
+    @staticmethod
+    @st.cache_data(show_spinner=False, ttl=3600, max_entries=16)
+    def fetch_image(url: str) -> Image.Image:
+        """
+        URLから画像をダウンロードしてデコードします（キャッシュ付き）
+        
+        同じURLでは再実行のたびにダウンロードせず、デコード済みの画像を再利用します。
+        失敗時の例外はキャッシュされないため、次回の呼び出しで再試行されます。
+        
+        Args:
+            url: 画像のURL
+            
+        Returns:
+            デコード済みの画像
+        """
+        return ImageLoader.download_image(url)
+    
+    @staticmethod
+    def download_image(url: str) -> Image.Image:
+        """
+        URLから画像をダウンロードしてデコードします
+        
+        Streamlit APIを呼ばないため、バックグラウンドのスレッドからも実行できます。
+        
+        Args:
+            url: 画像のURL
+            
+        Returns:
+            デコード済みの画像
+        """
+        response = _SESSION.get(url, timeout=_FETCH_TIMEOUT)
+        response.raise_for_status()
+        # ソケットから小刻みに読まず、展開済みの本文をまとめて渡す
+        image = Image.open(BytesIO(response.content))
+        # JPEGはDCT領域で縮小しながらデコードする（1024px四方を下回らない範囲で、JPEG以外では何もしない）
+        image.draft("RGB", _DRAFT_SIZE)
+        # キャッシュする前にデコードを済ませておく
+        image.load()
+        return image
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=3)
+    def decode_uploaded(file_id: str, _raw: bytes) -> Image.Image:
+        """
+        アップロードされた画像のバイト列をデコードします（キャッシュ付き）
+        
+        Streamlitが割り当てるファイルIDをキーにするため、同じファイルでは
+        再実行のたびにJPEG/PNGを展開し直しません。数MBのバイト列自体はハッシュしません。
+        
+        Args:
+            file_id: アップロードファイルのID
+            _raw: ファイルのバイト列（キャッシュキーには含めない）
+            
+        Returns:
+            デコード済みの画像
+        """
+        image = Image.open(BytesIO(_raw))
+        image.load()
+        return image
+    
     @staticmethod
     def load_from_url(url: str) -> Optional[Image.Image]:
         """
@@ -25,9 +107,7 @@ class ImageLoader:
             読み込まれた画像、失敗時はNone
         """
         try:
-            response = requests.get(url, stream=True, timeout=10)
-            response.raise_for_status()
-            return Image.open(response.raw)
+            return ImageLoader.fetch_image(url)
         except Exception as e:
             st.error(f"URLからの画像読み込みに失敗しました: {e}")
             return None
@@ -44,7 +124,7 @@ class ImageLoader:
             読み込まれた画像、失敗時はNone
         """
         try:
-            return Image.open(uploaded_file)
+            return ImageLoader.decode_uploaded(uploaded_file.file_id, uploaded_file.getvalue())
         except Exception as e:
             st.error(f"アップロードファイルの読み込みに失敗しました: {e}")
             return None
@@ -61,7 +141,7 @@ class ImageLoader:
             # Streamlitのカメラ入力を使用
             camera_input = st.camera_input("カメラで撮影")
             if camera_input is not None:
-                return Image.open(camera_input)
+                return ImageLoader.decode_uploaded(camera_input.file_id, camera_input.getvalue())
             return None
         except Exception as e:
             st.error(f"カメラからの画像読み込みに失敗しました: {e}")
@@ -114,7 +194,8 @@ class ImageValidator:
             "height": image.height,
             "mode": image.mode,
             "format": image.format,
-            "size_mb": len(image.tobytes()) / (1024 * 1024)
+            # tobytes()でラスタ全体を複製せず、寸法とバンド数から算出
+            "size_mb": image.width * image.height * len(image.getbands()) / (1024 * 1024)
         }
 
 
@@ -146,8 +227,8 @@ class ImageVisualizer:
     @staticmethod
     def create_detection_visualization(
         image: Image.Image,
-        boxes: List[List[float]],
-        scores: List[float],
+        boxes: np.ndarray,
+        scores: np.ndarray,
         labels: List[str],
         confidence_threshold: float = 0.5
     ) -> Image.Image:
@@ -156,36 +237,37 @@ class ImageVisualizer:
         
         Args:
             image: 元画像
-            boxes: バウンディングボックスの座標リスト
-            scores: 信頼度スコアのリスト
+            boxes: バウンディングボックスの座標配列 (N, 4)
+            scores: 信頼度スコアの配列 (N,)
             labels: ラベルのリスト
             confidence_threshold: 信頼度の閾値
             
         Returns:
             検出結果を描画した画像
         """
-        import cv2
-        
-        # PIL画像をOpenCV形式に変換
-        img_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # 閾値以上の検出結果のみを描画
-        for box, score, label in zip(boxes, scores, labels):
-            if score >= confidence_threshold:
-                x1, y1, x2, y2 = [int(coord) for coord in box]
-                
-                # バウンディングボックスを描画
-                cv2.rectangle(img_cv, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                
-                # ラベルとスコアを描画
-                label_text = f"{label}: {score:.3f}"
-                cv2.putText(
-                    img_cv, label_text, (x1, y1 - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2
-                )
-        
-        # OpenCV形式をPIL形式に戻す
-        return Image.fromarray(cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB))
+        # PILのまま描画し、numpy/OpenCVとの変換を行わない
+        # convertは常に新しい画像を返すため、RGB化とコピーを1つの作業バッファで兼ねる
+        output = image.convert("RGB")
+        
+        # 閾値以上の検出結果のみをまとめて抽出
+        keep = scores >= confidence_threshold
+        if not keep.any():
+            return output
+        
+        boxes_np = boxes.reshape(-1, 4)[keep].astype(np.int32)
+        scores_np = scores[keep]
+        kept_labels = [label for label, k in zip(labels, keep) if k]
+        
+        draw = ImageDraw.Draw(output)
+        for (x1, y1, x2, y2), score, label in zip(boxes_np.tolist(), scores_np.tolist(), kept_labels):
+            # バウンディングボックスを描画
+            draw.rectangle((x1, y1, x2, y2), outline=(0, 255, 0), width=2)
+            
+            # ラベルとスコアを描画
+            label_text = f"{label}: {score:.3f}"
+            draw.text((x1, y1 - 12), label_text, fill=(0, 255, 0), font=_LABEL_FONT)
+        
+        return output
 
 
 class ImagePreprocessor:
@@ -209,9 +291,10 @@ class ImagePreprocessor:
         if image.width <= max_size[0] and image.height <= max_size[1]:
             return image
         
-        # アスペクト比を保持してリサイズ
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        return image
+        # アスペクト比を保持してリサイズ（元画像は変更しない）
+        scale = min(max_size[0] / image.width, max_size[1] / image.height)
+        new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(new_size, Image.Resampling.LANCZOS)
     
     @staticmethod
     def convert_to_rgb(image: Image.Image) -> Image.Image:
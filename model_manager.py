@@ -3,23 +3,72 @@ OWL-ViTモデルの管理を担当するモジュール
 単一責任原則に従い、モデルの読み込み、推論、後処理機能を提供
 """
 
+import os
+import asyncio
+import contextlib
+import hashlib
 import torch
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, ContextManager
+from PIL import Image
 from transformers import AutoProcessor, OwlViTForObjectDetection
+from transformers.models.owlvit.modeling_owlvit import OwlViTObjectDetectionOutput
 import streamlit as st
 
+from image_processor import ImagePreprocessor
+from translator import JapaneseTranslator
+
+try:
+    import torch_tensorrt
+except ImportError:
+    torch_tensorrt = None
+
+
+# 入力ごとにサイズの異なるテンソルを確保しても断片化しにくいようにCUDAアロケーターを設定する
+# （CUDAの初期化前に設定する必要がある）
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:128")
+
+# Inductorのコンパイル結果をディスクに保存し、プロセス再起動後も再利用する
+os.environ.setdefault(
+    "TORCHINDUCTOR_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".torchinductor_cache")
+)
+try:
+    import torch._inductor.config as inductor_config
+    inductor_config.fx_graph_cache = True
+except (ImportError, AttributeError):
+    pass
+
+
+class _UntranslatedQueriesError(Exception):
+    """API翻訳に失敗したクエリを含む結果（キャッシュさせないために例外として返す）"""
+    
+    def __init__(self, formatted_queries: Tuple[str, ...]) -> None:
+        super().__init__("一部のクエリを翻訳できませんでした")
+        self.formatted_queries = formatted_queries
+
 
 class ModelLoader:
     """モデルの読み込みを担当するクラス"""
     
     DEFAULT_MODEL_NAME = "google/owlvit-base-patch32"
     
+    # コンパイル直後のウォームアップ回数（2回目でプロファイリングが安定する）
+    WARMUP_ITERATIONS = 2
+    
+    # TensorRTエンジンの保存先
+    TENSORRT_CACHE_DIR = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), ".tensorrt_cache"
+    )
+    
     @staticmethod
     @st.cache_resource
     def load_model_and_processor(model_name: str = DEFAULT_MODEL_NAME) -> Tuple[Optional[OwlViTForObjectDetection], Optional[Any]]:
         """
         モデルとプロセッサーを読み込みます
         
+        st.cache_resourceによりモデル名ごとに一度だけ実行されるため、
+        torch.compileのコンパイルとウォームアップもここで済ませます。
+        
         Args:
             model_name: モデル名
             
@@ -28,13 +77,262 @@ class ModelLoader:
         """
         try:
             with st.spinner(f"モデル '{model_name}' を読み込み中..."):
-                processor = AutoProcessor.from_pretrained(model_name)
-                model = OwlViTForObjectDetection.from_pretrained(model_name)
-                return model, processor
+                # 高速な画像プロセッサー（torchベース）を優先して使用する
+                # 対応していないtransformersでは従来のプロセッサーにフォールバックされる
+                processor = AutoProcessor.from_pretrained(model_name, use_fast=True)
+                model = ModelLoader._load_model(model_name)
+            
+            with st.spinner("モデルをコンパイル中（初回のみ）..."):
+                if torch.cuda.is_available() and torch_tensorrt is not None:
+                    model = ModelLoader.compile_with_tensorrt(model, processor, model_name)
+                else:
+                    model = ModelLoader.compile_model(model, processor)
+            return model, processor
         except Exception as e:
             st.error(f"モデルの読み込みに失敗しました: {e}")
             return None, None
     
+    @staticmethod
+    def _load_model(model_name: str) -> OwlViTForObjectDetection:
+        """
+        SDPA（FlashAttention）を有効にしてモデルを読み込みます
+        
+        GPUが利用可能な場合はFP16で読み込んでGPUに配置します。
+        SDPAに対応していないtransformersでは標準のアテンション実装を使用します。
+        
+        Args:
+            model_name: モデル名
+            
+        Returns:
+            読み込まれたモデル
+        """
+        use_cuda = torch.cuda.is_available()
+        dtype = torch.float16 if use_cuda else torch.float32
+        
+        try:
+            model = OwlViTForObjectDetection.from_pretrained(
+                model_name, attn_implementation="sdpa", torch_dtype=dtype
+            )
+        except (ValueError, TypeError):
+            model = OwlViTForObjectDetection.from_pretrained(model_name, torch_dtype=dtype)
+        
+        if use_cuda:
+            model = model.to("cuda")
+            # 入力サイズは固定のため、パッチ埋め込みの畳み込みに最速のアルゴリズムを選ばせる
+            torch.backends.cudnn.benchmark = True
+        
+        # 評価モードへの切り替えは全サブモジュールを走査するため、読み込み時に一度だけ行う
+        model.eval()
+        return model
+    
+    @staticmethod
+    def compile_model(model: OwlViTForObjectDetection, processor: Any) -> Any:
+        """
+        torch.compileでモデルをコンパイルし、ダミー入力でウォームアップします
+        
+        コンパイルに失敗した場合はeagerモードのモデルをそのまま返します。
+        
+        Args:
+            model: OWL-ViTモデル
+            processor: OWL-ViTプロセッサー
+            
+        Returns:
+            コンパイル済みのモデル、失敗時は元のモデル
+        """
+        if not hasattr(torch, "compile"):
+            return model
+        
+        try:
+            # クエリ数・トークン長は実行ごとに変わるため、形状を動的に扱って再コンパイルを避ける
+            compile_options = dict(mode="reduce-overhead", fullgraph=False, dynamic=True)
+            compiled_model = torch.compile(model, **compile_options)
+            
+            # テキスト埋め込みをキャッシュした推論と画像ガイド検出はforward以外のメソッドを
+            # 呼ぶため、それぞれコンパイルしたものに置き換える
+            model.image_embedder = torch.compile(model.image_embedder, **compile_options)
+            model.image_guided_detection = torch.compile(model.image_guided_detection, **compile_options)
+            
+            # プロセッサーが画像を固定サイズにリサイズするため、
+            # pixel_valuesの形状は入力画像に依らず一定になる
+            dummy_image = Image.new("RGB", ModelLoader.get_input_size(processor))
+            dummy_inputs = processor(
+                text=["a photo of a cat"],
+                images=dummy_image,
+                return_tensors="pt",
+                padding="longest",
+                truncation=True,
+                max_length=TextQueryProcessor.MAX_TOKEN_LENGTH
+            )
+            
+            # 実際の推論と同じデバイス・型の入力でウォームアップする
+            device = ModelLoader.get_device(model)
+            dummy_inputs = DetectionProcessor.move_inputs_to_device(
+                dict(dummy_inputs), device, ModelLoader.get_dtype(model)
+            )
+            
+            with torch.inference_mode(), ModelLoader.autocast_context(device):
+                for _ in range(ModelLoader.WARMUP_ITERATIONS):
+                    compiled_model(**dummy_inputs)
+                    model.image_embedder(pixel_values=dummy_inputs["pixel_values"])
+            
+            return compiled_model
+        except Exception as e:
+            st.warning(f"モデルのコンパイルに失敗したため、eagerモードで実行します: {e}")
+            # インスタンスに設定したコンパイル済みメソッドを外し、元のメソッドに戻す
+            model.__dict__.pop("image_embedder", None)
+            model.__dict__.pop("image_guided_detection", None)
+            return model
+    
+    @staticmethod
+    def compile_with_tensorrt(
+        model: OwlViTForObjectDetection,
+        processor: Any,
+        model_name: str
+    ) -> Any:
+        """
+        Torch-TensorRTでモデルをFP16エンジンにコンパイルします
+        
+        エンジンはモデル名と入力形状をキーにディスクへ保存し、次回以降は再利用します。
+        失敗した場合はtorch.compileによるコンパイルにフォールバックします。
+        
+        Args:
+            model: GPU上のOWL-ViTモデル
+            processor: OWL-ViTプロセッサー
+            model_name: モデル名
+            
+        Returns:
+            TensorRTでコンパイルされたモデル、失敗時はtorch.compileの結果
+        """
+        try:
+            width, height = ModelLoader.get_input_size(processor)
+            max_queries = TextQueryProcessor.MAX_QUERIES
+            max_length = model.config.text_config.max_position_embeddings
+            
+            # クエリ数とトークン長のみ可変、画像サイズは固定
+            text_input = torch_tensorrt.Input(
+                min_shape=(1, 1),
+                opt_shape=(max_queries, max_length),
+                max_shape=(max_queries, max_length),
+                dtype=torch.int64
+            )
+            kwarg_inputs = {
+                "input_ids": text_input,
+                "pixel_values": torch_tensorrt.Input((1, 3, height, width), dtype=torch.float16),
+                "attention_mask": text_input,
+            }
+            
+            engine_name = f"{model_name.replace('/', '--')}-{height}x{width}-q{max_queries}-l{max_length}.ep"
+            engine_path = os.path.join(ModelLoader.TENSORRT_CACHE_DIR, engine_name)
+            
+            if os.path.exists(engine_path):
+                trt_model = torch_tensorrt.load(engine_path).module()
+            else:
+                trt_model = torch_tensorrt.compile(
+                    model,
+                    ir="dynamo",
+                    kwarg_inputs=kwarg_inputs,
+                    enabled_precisions={torch.float16}
+                )
+                os.makedirs(ModelLoader.TENSORRT_CACHE_DIR, exist_ok=True)
+                torch_tensorrt.save(trt_model, engine_path)
+            
+            # 画像ガイド検出などforward以外の処理は元のモデルで実行する
+            trt_model.device = ModelLoader.get_device(model)
+            trt_model.dtype = torch.float16
+            trt_model.config = model.config
+            trt_model.image_guided_detection = model.image_guided_detection
+            return trt_model
+        except Exception as e:
+            st.warning(f"TensorRTでのコンパイルに失敗したため、torch.compileを使用します: {e}")
+            return ModelLoader.compile_model(model, processor)
+    
+    @staticmethod
+    def get_input_size(processor: Any) -> Tuple[int, int]:
+        """
+        モデルが想定する入力画像サイズを取得します
+        
+        Args:
+            processor: OWL-ViTプロセッサー
+            
+        Returns:
+            (幅, 高さ)のタプル
+        """
+        size = getattr(processor.image_processor, "size", None) or {}
+        return size.get("width", 768), size.get("height", 768)
+    
+    @staticmethod
+    def resize_to_input_size(processor: Any, image: Image.Image) -> Image.Image:
+        """
+        画像をモデルの入力サイズにリサイズします
+        
+        プロセッサーと同じ補間方法でリサイズするため、プロセッサーには
+        do_resize=Falseを渡してリサイズを省略できます。
+        
+        Args:
+            processor: OWL-ViTプロセッサー
+            image: 入力画像
+            
+        Returns:
+            入力サイズにリサイズされたRGB画像
+        """
+        image = ImagePreprocessor.convert_to_rgb(image)
+        input_size = ModelLoader.get_input_size(processor)
+        if image.size == input_size:
+            return image
+        resample = getattr(processor.image_processor, "resample", None)
+        resample = Image.Resampling.BICUBIC if resample is None else int(resample)
+        return image.resize(input_size, resample)
+    
+    @staticmethod
+    def get_device(model: Any) -> torch.device:
+        """
+        モデルが配置されているデバイスを取得します
+        
+        Args:
+            model: OWL-ViTモデル
+            
+        Returns:
+            モデルのデバイス
+        """
+        # TensorRTのモジュールはパラメータを持たないため、保持しているデバイスを優先
+        device = getattr(model, "device", None)
+        if isinstance(device, torch.device):
+            return device
+        return next(model.parameters()).device
+    
+    @staticmethod
+    def get_dtype(model: Any) -> torch.dtype:
+        """
+        モデルの重みの型を取得します
+        
+        Args:
+            model: OWL-ViTモデル
+            
+        Returns:
+            モデルの重みの型
+        """
+        dtype = getattr(model, "dtype", None)
+        if isinstance(dtype, torch.dtype):
+            return dtype
+        return next(model.parameters()).dtype
+    
+    @staticmethod
+    def autocast_context(device: torch.device) -> ContextManager:
+        """
+        デバイスに応じた混合精度のautocastコンテキストを作成します
+        
+        CPUではBF16にするとボックス座標がBF16のまま残り精度も落ちるため、FP32のまま推論します。
+        
+        Args:
+            device: 推論を実行するデバイス
+            
+        Returns:
+            GPUではFP16のautocastコンテキスト、CPUでは何もしないコンテキスト
+        """
+        if device.type == "cuda":
+            return torch.autocast(device_type="cuda", dtype=torch.float16)
+        return contextlib.nullcontext()
+    
     @staticmethod
     def get_available_models() -> List[str]:
         """
@@ -53,6 +351,12 @@ class ModelLoader:
 class TextQueryProcessor:
     """テキストクエリの処理を担当するクラス"""
     
+    # 一度に使用できるクエリの最大数（エラー回避のため）
+    MAX_QUERIES = 5
+    
+    # トークン化の最大長（OWL-ViTのテキストエンコーダーの位置埋め込み数）
+    MAX_TOKEN_LENGTH = 16
+    
     @staticmethod
     def validate_text_queries(text_queries: List[str]) -> bool:
         """
@@ -69,16 +373,67 @@ class TextQueryProcessor:
             return False
         
         for query in text_queries:
-            if not query.strip():
+            query = query.strip()
+            if not query:
                 st.warning("空のテキストクエリは使用できません")
                 return False
             
-            if len(query.strip()) < 2:
+            if len(query) < 2:
                 st.warning("テキストクエリは2文字以上である必要があります")
                 return False
         
         return True
     
+    @staticmethod
+    def _translate_queries(queries: Tuple[str, ...], use_api: bool) -> Tuple[str, ...]:
+        """
+        クエリを翻訳し、OWL-ViT用のプロンプト形式に変換します
+        
+        API翻訳に失敗して元の日本語が残った結果はキャッシュせず、次回の実行で再試行します。
+        
+        Args:
+            queries: 前処理済みのクエリ
+            use_api: 外部APIを使用するかどうか
+            
+        Returns:
+            "a photo of a ..."形式のクエリ
+        """
+        try:
+            return TextQueryProcessor._translate_queries_cached(queries, use_api)
+        except _UntranslatedQueriesError as e:
+            return e.formatted_queries
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False)
+    def _translate_queries_cached(queries: Tuple[str, ...], use_api: bool) -> Tuple[str, ...]:
+        """
+        クエリを翻訳し、OWL-ViT用のプロンプト形式に変換します（キャッシュ付き）
+        
+        Args:
+            queries: 前処理済みのクエリ
+            use_api: 外部APIを使用するかどうか
+            
+        Returns:
+            "a photo of a ..."形式のクエリ
+            
+        Raises:
+            _UntranslatedQueriesError: API翻訳に失敗したクエリがある場合（例外はキャッシュされない）
+        """
+        # 日本語のクエリはまとめて翻訳（APIは1回のリクエストで済ませる）
+        japanese_indices = [i for i, query in enumerate(queries) if JapaneseTranslator.is_japanese(query)]
+        english_queries = list(queries)
+        translations = JapaneseTranslator.translate_queries(
+            [queries[i] for i in japanese_indices], use_api=use_api
+        )
+        for i, english_translation in zip(japanese_indices, translations):
+            english_queries[i] = english_translation
+        
+        # 基本的なクエリ形式のみを生成
+        formatted_queries = tuple(f"a photo of a {query}" for query in english_queries)
+        if use_api and any(translations[j] == queries[i] for j, i in enumerate(japanese_indices)):
+            raise _UntranslatedQueriesError(formatted_queries)
+        return formatted_queries
+    
     @staticmethod
     def format_text_queries(text_queries: List[str], translation_method: str = "辞書翻訳のみ") -> List[List[str]]:
         """
@@ -91,12 +446,10 @@ class TextQueryProcessor:
         Returns:
             フォーマットされたテキストクエリのリスト
         """
-        from translator import JapaneseTranslator
-        
         use_api = translation_method == "辞書翻訳 + API翻訳"
         
         # 各元クエリに対して、基本的なクエリ形式のみを生成
-        formatted_queries = []
+        queries = []
         
         for query in text_queries:
             query = query.strip()
@@ -106,43 +459,252 @@ class TextQueryProcessor:
                 query = query[:50]
                 st.warning(f"クエリが長すぎるため、最初の50文字に短縮しました: {query}")
             
-            # 基本的なクエリ形式のみを生成
-            if JapaneseTranslator.is_japanese(query):
-                # 日本語の場合、英語に翻訳
-                english_translation = JapaneseTranslator.translate_japanese_to_english(query, use_api=use_api)
-                if english_translation != query:
-                    formatted_queries.append(f"a photo of a {english_translation}")
-                else:
-                    formatted_queries.append(f"a photo of a {query}")
-            else:
-                # 英語の場合、基本的な形式
-                formatted_queries.append(f"a photo of a {query}")
+            queries.append(query)
+        
+        # 同じクエリの組み合わせでは翻訳結果をキャッシュから再利用
+        formatted_queries = list(TextQueryProcessor._translate_queries(tuple(queries), use_api))
         
         # クエリの数を制限（エラー回避のため）
-        if len(formatted_queries) > 5:
-            formatted_queries = formatted_queries[:5]
-            st.warning(f"クエリの数が多すぎるため、最初の5個に制限しました")
-            
-        # デバッグ情報を表示
-        if st.session_state.get('debug_mode', True):
-            st.write(f"**📝 生成されたクエリバリエーション:**")
-            st.write(f"- 元のクエリ数: {len(text_queries)}")
-            st.write(f"- 生成されたクエリ数: {len(formatted_queries)}")
-            for i, query in enumerate(formatted_queries):
-                st.write(f"  {i+1}. '{query}'")
-        
-        # OWL-ViTの期待する形式: 各クエリを個別のリストとして返す
-        return [[query] for query in formatted_queries]
+        if len(formatted_queries) > TextQueryProcessor.MAX_QUERIES:
+            formatted_queries = formatted_queries[:TextQueryProcessor.MAX_QUERIES]
+            st.warning(f"クエリの数が多すぎるため、最初の{TextQueryProcessor.MAX_QUERIES}個に制限しました")
+            
+        # デバッグ情報をまとめて表示
+        if st.session_state.get('debug_mode', False):
+            log = [
+                "📝 生成されたクエリバリエーション:",
+                f"- 元のクエリ数: {len(text_queries)}",
+                f"- 生成されたクエリ数: {len(formatted_queries)}"
+            ]
+            log.extend(f"  {i+1}. '{query}'" for i, query in enumerate(formatted_queries))
+            st.code("\n".join(log))
+        
+        # OWL-ViTの期待する形式: 1枚の画像に対する全クエリを1つのリストにまとめて返す
+        return [formatted_queries]
+    
+    @staticmethod
+    @st.cache_resource(show_spinner=False, max_entries=16)
+    def encode_text_queries(
+        _model: OwlViTForObjectDetection,
+        _processor: Any,
+        model_name: str,
+        queries: Tuple[str, ...]
+    ) -> Optional[Dict[str, torch.Tensor]]:
+        """
+        テキストクエリの埋め込みを事前に計算します（キャッシュ付き）
+        
+        テキストエンコーダーの出力は画像に依存しないため、モデル名とクエリの組み合わせごとに
+        一度だけ計算し、画像が変わっても再利用します。
+        
+        Args:
+            _model: OWL-ViTモデル（ハッシュ対象外）
+            _processor: OWL-ViTプロセッサー（ハッシュ対象外）
+            model_name: モデル名
+            queries: 正規化されたテキストクエリ
+            
+        Returns:
+            query_embeds (1, クエリ数, 次元) とquery_mask (1, クエリ数) を持つ辞書、
+            テキストエンコーダーを分離できないモデルではNone
+        """
+        # TensorRTのモジュールなどテキストエンコーダーを直接呼べない場合は通常の推論を使う
+        if not hasattr(_model, "owlvit"):
+            return None
+        
+        device = ModelLoader.get_device(_model)
+        text_inputs = DetectionProcessor.move_inputs_to_device(
+            DetectionProcessor._tokenize_text(_processor, model_name, queries), device
+        )
+        with torch.inference_mode(), ModelLoader.autocast_context(device):
+            text_embeds = _model.owlvit.get_text_features(
+                input_ids=text_inputs["input_ids"],
+                attention_mask=text_inputs["attention_mask"]
+            )
+            # OwlViTModel.forwardと同じくL2正規化する
+            text_embeds = text_embeds / torch.linalg.norm(text_embeds, ord=2, dim=-1, keepdim=True)
+        
+        return {
+            "query_embeds": text_embeds.unsqueeze(0),
+            "query_mask": (text_inputs["input_ids"][:, 0] > 0).unsqueeze(0)
+        }
 
 
 class DetectionProcessor:
     """物体検出の処理を担当するクラス"""
     
+    # 未使用のGPUメモリをまとめて解放する間隔（推論回数）
+    EMPTY_CACHE_INTERVAL = 50
+    
+    # プロセス全体での推論回数
+    _inference_count = 0
+    
+    @staticmethod
+    def compute_image_key(image: Image.Image) -> str:
+        """
+        画像の内容を識別するキーを計算します
+        
+        Args:
+            image: 対象の画像
+            
+        Returns:
+            画像のモード・サイズ・画素データから求めたハッシュ値
+        """
+        digest = hashlib.md5(image.tobytes()).hexdigest()
+        return f"{image.mode}-{image.width}x{image.height}-{digest}"
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False)
+    def _tokenize_text(
+        _processor: Any,
+        model_name: str,
+        queries: Tuple[str, ...]
+    ) -> Dict[str, torch.Tensor]:
+        """
+        テキストクエリをトークン化します（キャッシュ付き）
+        
+        クエリが変わらない限り、画像を変えてもトークン化をやり直しません。
+        
+        Args:
+            _processor: OWL-ViTプロセッサー（ハッシュ対象外）
+            model_name: プロセッサーのモデル名
+            queries: 正規化されたテキストクエリ
+            
+        Returns:
+            input_idsとattention_maskを持つCPU上のテンソルの辞書
+        """
+        text_inputs = _processor(
+            text=[list(queries)],  # 1枚の画像に対するクエリのリスト
+            return_tensors="pt",
+            padding="longest",
+            truncation=True,
+            max_length=TextQueryProcessor.MAX_TOKEN_LENGTH
+        )
+        return dict(text_inputs)
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=8)
+    def _encode_image(
+        _processor: Any,
+        processor_name: str,
+        image_key: str,
+        _image: Image.Image
+    ) -> Dict[str, torch.Tensor]:
+        """
+        画像を前処理します（キャッシュ付き）
+        
+        Args:
+            _processor: OWL-ViTプロセッサー（ハッシュ対象外）
+            processor_name: プロセッサーのモデル名
+            image_key: 画像を識別するキー
+            _image: 入力画像（ハッシュ対象外）
+            
+        Returns:
+            pixel_valuesを持つCPU上のテンソルの辞書
+        """
+        # PILで入力サイズに一度だけリサイズし、プロセッサーでのリサイズは省略する
+        image_inputs = _processor(
+            images=ModelLoader.resize_to_input_size(_processor, _image),  # 単一の画像
+            return_tensors="pt",
+            do_resize=False
+        )
+        return dict(image_inputs)
+    
+    @staticmethod
+    def get_target_sizes(image: Image.Image, device: Optional[torch.device] = None) -> torch.Tensor:
+        """
+        後処理に使うターゲットサイズを取得します
+        
+        Args:
+            image: 元画像
+            device: テンソルを配置するデバイス（モデルと同じデバイス）
+            
+        Returns:
+            (高さ, 幅)を要素とするテンソル
+        """
+        target_sizes_cache = st.session_state.setdefault("target_sizes_cache", {})
+        cache_key = (image.size, str(device))
+        if cache_key not in target_sizes_cache:
+            target_sizes_cache[cache_key] = torch.tensor([image.size[::-1]], device=device)
+        return target_sizes_cache[cache_key]
+    
+    @staticmethod
+    def move_inputs_to_device(
+        inputs: Dict[str, Any],
+        device: torch.device,
+        dtype: Optional[torch.dtype] = None
+    ) -> Dict[str, Any]:
+        """
+        モデルへの入力をデバイスに転送します
+        
+        GPUの場合は画像テンソルをピン留めメモリから非同期に転送し、前の処理と転送を重ねます。
+        
+        Args:
+            inputs: モデルへの入力
+            device: 転送先のデバイス
+            dtype: 画像テンソル（pixel_values等）の変換先の型
+            
+        Returns:
+            デバイスに転送された入力
+        """
+        for key, value in inputs.items():
+            if not isinstance(value, torch.Tensor):
+                continue
+            # ピン留めするのは大きな画像テンソルのみ（小さなトークンIDはピン留めの方が高くつく）
+            if device.type == "cuda" and value.is_floating_point():
+                value = value.pin_memory()
+            # 整数のトークンIDはそのまま、浮動小数点の画像テンソルのみ型を合わせる
+            value_dtype = dtype if dtype is not None and value.is_floating_point() else None
+            inputs[key] = value.to(device, dtype=value_dtype, non_blocking=True)
+        return inputs
+    
+    @staticmethod
+    def move_results_to_cpu(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        後処理された結果をCPUに転送します
+        
+        boxes・scores・labelsを1つのテンソルにまとめ、GPU→CPU転送と同期を
+        全結果で一度だけ行います。
+        
+        Args:
+            results: 後処理された結果
+            
+        Returns:
+            CPU上のテンソルを持つ結果
+        """
+        if not results or all(result["boxes"].device.type == "cpu" for result in results):
+            # CPU上でもnumpyに変換できるよう、boxesとscoresはFP32にそろえる
+            return [
+                {**result, "boxes": result["boxes"].float(), "scores": result["scores"].float()}
+                for result in results
+            ]
+        
+        # 各結果を (N, 6) = [x1, y1, x2, y2, score, label] にまとめて連結
+        packed = torch.cat([
+            torch.cat([
+                result["boxes"].float(),
+                result["scores"].float().unsqueeze(-1),
+                result["labels"].float().unsqueeze(-1)
+            ], dim=-1)
+            for result in results
+        ], dim=0).cpu()
+        
+        cpu_results = []
+        lengths = [len(result["scores"]) for result in results]
+        for chunk in torch.split(packed, lengths, dim=0):
+            cpu_results.append({
+                "boxes": chunk[:, :4],
+                "scores": chunk[:, 4],
+                "labels": chunk[:, 5].long()
+            })
+        return cpu_results
+    
     @staticmethod
     def prepare_inputs(
         processor: Any,
         image: Any,
-        text_queries: List[List[str]]
+        text_queries: List[List[str]],
+        device: Optional[torch.device] = None,
+        dtype: Optional[torch.dtype] = None,
+        image_key: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
         """
         モデルへの入力を準備します
@@ -150,108 +712,205 @@ class DetectionProcessor:
         Args:
             processor: OWL-ViTプロセッサー
             image: 入力画像
-            text_queries: テキストクエリのリスト
+            text_queries: 画像ごとのテキストクエリのリスト（[[クエリ1, クエリ2, ...]]）
+            device: 入力を転送するデバイス（省略時はCPUのまま）
+            dtype: pixel_valuesの型（モデルの重みの型に合わせる）
+            image_key: compute_image_keyで計算済みの画像キー（省略時はここで計算）
             
         Returns:
             準備された入力、失敗時はNone
         """
+        # デバッグ情報は一度だけ判定し、最後にまとめて表示する
+        dbg = st.session_state.get('debug_mode', False)
+        log = []
         try:
-            # デバッグ情報の表示（条件付き）
-            if st.session_state.get('debug_mode', True):
-                st.write("**🔍 入力準備のデバッグ情報:**")
-                st.write(f"- 元のテキストクエリ数: {len(text_queries)}")
+            if dbg:
+                log.append("🔍 入力準備のデバッグ情報:")
+                log.append(f"- 元のテキストクエリ数: {len(text_queries[0]) if text_queries else 0}")
             
             # テキストクエリの検証
             if not text_queries or not isinstance(text_queries, list):
                 st.error("テキストクエリが無効です")
                 return None
             
-            # 各クエリリストから最初のクエリを取得
+            # 1枚の画像に対する全クエリをまとめて1回の推論で処理する
+            query_list = text_queries[0]
+            if not isinstance(query_list, list) or len(query_list) == 0:
+                st.error("テキストクエリの形式が不正です")
+                return None
+            
             normalized_queries = []
-            for i, query_list in enumerate(text_queries):
-                if isinstance(query_list, list) and len(query_list) > 0:
-                    query = query_list[0]
-                    if len(query) > 100:  # 最大100文字に制限
-                        query = query[:100]
-                    normalized_queries.append(query)
-                    if st.session_state.get('debug_mode', True):
-                        st.write(f"- クエリ {i+1}: '{query}'")
-                else:
-                    st.error("テキストクエリの形式が不正です")
-                    return None
+            for i, query in enumerate(query_list):
+                if len(query) > 100:  # 最大100文字に制限
+                    query = query[:100]
+                normalized_queries.append(query)
+                if dbg:
+                    log.append(f"- クエリ {i+1}: '{query}'")
             
-            if st.session_state.get('debug_mode', True):
-                st.write(f"- 正規化されたクエリ数: {len(normalized_queries)}")
+            if dbg:
+                log.append(f"- 正規化されたクエリ数: {len(normalized_queries)}")
             
-            # OWL-ViTの正しい入力形式で処理
-            # 各クエリに対して同じ画像を使用
-            inputs = processor(
-                text=normalized_queries,  # 文字列のリスト
-                images=image,  # 単一の画像
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=128
+            # テキストと画像を別々にエンコードしてまとめる
+            # クエリが同じならトークン化を、画像が同じなら前処理をキャッシュから再利用
+            processor_name = processor.tokenizer.name_or_path
+            if image_key is None:
+                image_key = DetectionProcessor.compute_image_key(image)
+            inputs = DetectionProcessor._tokenize_text(
+                processor, processor_name, tuple(normalized_queries)
             )
+            inputs.update(DetectionProcessor._encode_image(
+                processor,
+                processor_name,
+                image_key,
+                image
+            ))
+            if device is not None:
+                inputs = DetectionProcessor.move_inputs_to_device(inputs, device, dtype)
             
-            if st.session_state.get('debug_mode', True):
-                st.write("✅ 入力の準備が完了しました")
+            if dbg:
+                log.append("✅ 入力の準備が完了しました")
                 if 'input_ids' in inputs:
-                    st.write(f"- 入力テンソルの形状: {inputs['input_ids'].shape}")
+                    log.append(f"- 入力テンソルの形状: {inputs['input_ids'].shape}")
+                st.code("\n".join(log))
             
             return inputs
         except Exception as e:
+            if dbg and log:
+                st.code("\n".join(log))
             st.error(f"入力の準備に失敗しました: {e}")
             # デバッグ情報を表示
-            st.write(f"テキストクエリの数: {len(text_queries)}")
-            for i, query_list in enumerate(text_queries):
-                st.write(f"クエリ {i+1} の長さ: {len(query_list)}")
-                st.write(f"クエリ {i+1} の内容: {query_list}")
+            st.write(f"テキストクエリの数: {len(text_queries[0]) if text_queries else 0}")
+            for i, query in enumerate(text_queries[0] if text_queries else []):
+                st.write(f"クエリ {i+1} の長さ: {len(query)}")
+                st.write(f"クエリ {i+1} の内容: {query}")
             return None
     
+    @staticmethod
+    def _detect_with_text_embeds(
+        model: OwlViTForObjectDetection,
+        pixel_values: torch.Tensor,
+        cached_text_embeds: Dict[str, torch.Tensor]
+    ) -> OwlViTObjectDetectionOutput:
+        """
+        事前計算したテキスト埋め込みを使い、画像エンコーダーと検出ヘッドのみを実行します
+        
+        OwlViTForObjectDetection.forwardからテキストエンコーダーの処理を除いたものです。
+        
+        Args:
+            model: OWL-ViTモデル
+            pixel_values: 前処理された画像 (1, 3, H, W)
+            cached_text_embeds: encode_text_queriesの出力
+            
+        Returns:
+            logitsとpred_boxesを持つ検出結果
+        """
+        feature_map = model.image_embedder(pixel_values=pixel_values)[0]
+        batch_size, num_patches_height, num_patches_width, hidden_dim = feature_map.shape
+        image_feats = torch.reshape(
+            feature_map, (batch_size, num_patches_height * num_patches_width, hidden_dim)
+        )
+        
+        query_embeds = cached_text_embeds["query_embeds"].expand(batch_size, -1, -1)
+        query_mask = cached_text_embeds["query_mask"].expand(batch_size, -1)
+        pred_logits, class_embeds = model.class_predictor(image_feats, query_embeds, query_mask)
+        pred_boxes = model.box_predictor(image_feats, feature_map)
+        
+        return OwlViTObjectDetectionOutput(
+            logits=pred_logits,
+            pred_boxes=pred_boxes,
+            text_embeds=query_embeds,
+            image_embeds=feature_map,
+            class_embeds=class_embeds
+        )
+    
     @staticmethod
     def run_inference(
         model: OwlViTForObjectDetection,
-        inputs: Dict[str, Any]
+        inputs: Dict[str, Any],
+        cached_text_embeds: Optional[Dict[str, torch.Tensor]] = None,
+        cache_key: Optional[Tuple] = None,
+        force_recompute: bool = False
     ) -> Optional[Any]:
         """
         推論を実行します
         
+        cache_keyが前回の推論と同じ場合は、推論を行わずに前回の結果を返します。
+        
         Args:
             model: OWL-ViTモデル
             inputs: モデルへの入力
+            cached_text_embeds: 事前計算したテキスト埋め込み（指定時はテキストエンコーダーを省略）
+            cache_key: 入力を識別するキー（モデル名・クエリ・画像のハッシュ）
+            force_recompute: Trueの場合は前回の結果を使わずに推論を実行
             
         Returns:
             推論結果、失敗時はNone
         """
+        # デバッグ情報は一度だけ判定し、最後にまとめて表示する
+        dbg = st.session_state.get('debug_mode', False)
+        
+        # 同じ入力での再実行では推論を省略する
+        if (
+            cache_key is not None
+            and not force_recompute
+            and st.session_state.get("last_key") == cache_key
+        ):
+            if dbg:
+                st.code("♻️ 前回と同じ入力のため、前回の推論結果を再利用します")
+            return st.session_state["last_outputs"]
+        
+        log = []
         try:
-            if st.session_state.get('debug_mode', True):
-                st.write("**🚀 推論実行中...**")
+            if dbg:
+                log.append("🚀 推論実行中...")
             
-            # モデルを評価モードに設定
-            model.eval()
-            
-            with torch.no_grad():
-                # シンプルな推論実行
-                outputs = model(**inputs)
+            # 勾配計算なし・混合精度で推論
+            device = ModelLoader.get_device(model)
+            with torch.inference_mode(), ModelLoader.autocast_context(device):
+                if cached_text_embeds is not None:
+                    outputs = DetectionProcessor._detect_with_text_embeds(
+                        model, inputs["pixel_values"], cached_text_embeds
+                    )
+                else:
+                    outputs = model(**inputs)
             
-            # 推論結果のデバッグ情報を表示
-            if st.session_state.get('debug_mode', True) and hasattr(outputs, 'logits'):
+            # 推論結果のデバッグ情報を記録
+            if dbg and hasattr(outputs, 'logits'):
                 logits_shape = outputs.logits.shape
-                st.write(f"- ロジットの形状: {logits_shape}")
+                log.append(f"- ロジットの形状: {logits_shape}")
                 
-                # 最大スコアを表示
-                max_scores = torch.max(outputs.logits, dim=-1)[0]
-                st.write(f"- 最大スコア: {torch.max(max_scores).item():.4f}")
-                st.write(f"- 平均スコア: {torch.mean(max_scores).item():.4f}")
+                # 最大スコアを記録（GPUとの同期は1回のみ）
+                max_scores = torch.max(outputs.logits, dim=-1)[0].float()
+                max_score, mean_score = torch.stack([max_scores.max(), max_scores.mean()]).cpu().tolist()
+                log.append(f"- 最大スコア: {max_score:.4f}")
+                log.append(f"- 平均スコア: {mean_score:.4f}")
+            
+            # 毎回解放するとアロケーターの再確保が増えるため、一定回数ごとに未使用のGPUメモリを解放する
+            DetectionProcessor._inference_count += 1
+            if (
+                device.type == "cuda"
+                and DetectionProcessor._inference_count % DetectionProcessor.EMPTY_CACHE_INTERVAL == 0
+            ):
+                torch.cuda.empty_cache()
+            
+            if dbg:
+                log.append("✅ 推論が完了しました")
+                st.code("\n".join(log))
             
-            if st.session_state.get('debug_mode', True):
-                st.write("✅ 推論が完了しました")
+            if cache_key is not None:
+                # コンパイル済みモデルの出力はCUDAグラフが再利用するメモリ上にあるため、
+                # 後処理に必要なlogitsとpred_boxesだけを複製して保持する
+                st.session_state["last_key"] = cache_key
+                st.session_state["last_outputs"] = OwlViTObjectDetectionOutput(
+                    logits=outputs.logits.clone(),
+                    pred_boxes=outputs.pred_boxes.clone()
+                )
             return outputs
         except Exception as e:
             st.error(f"推論の実行に失敗しました: {e}")
-            if st.session_state.get('debug_mode', True):
-                st.write(f"エラーの詳細: {str(e)}")
+            if dbg:
+                log.append(f"エラーの詳細: {str(e)}")
+                st.code("\n".join(log))
             return None
     
     @staticmethod
@@ -273,9 +932,12 @@ class DetectionProcessor:
         Returns:
             後処理された結果、失敗時はNone
         """
+        # デバッグ情報は一度だけ判定し、最後にまとめて表示する
+        dbg = st.session_state.get('debug_mode', False)
+        log = []
         try:
-            if st.session_state.get('debug_mode', True):
-                st.write(f"**🔧 後処理実行中 (閾値: {confidence_threshold:.3f})...**")
+            if dbg:
+                log.append(f"🔧 後処理実行中 (閾値: {confidence_threshold:.3f})...")
             
             # シンプルな後処理
             results = processor.post_process_object_detection(
@@ -284,31 +946,164 @@ class DetectionProcessor:
                 target_sizes=target_sizes
             )
             
-            # 後処理結果のデバッグ情報を表示
-            if st.session_state.get('debug_mode', True) and results and len(results) > 0:
-                total_boxes = sum(len(result.get("boxes", [])) for result in results)
-                st.write(f"- 検出されたボックス数: {total_boxes}")
+            # 後処理結果のデバッグ情報を記録
+            if dbg and results and len(results) > 0:
+                total_boxes = sum(result["boxes"].shape[0] for result in results if "boxes" in result)
+                log.append(f"- 検出されたボックス数: {total_boxes}")
                 
                 for i, result in enumerate(results):
-                    boxes = result.get("boxes", [])
-                    scores = result.get("scores", [])
-                    if len(boxes) > 0:
-                        st.write(f"- クエリ {i+1}: {len(boxes)}個のボックス")
-                        st.write(f"  - 最高スコア: {max(scores):.4f}")
-                        st.write(f"  - 平均スコア: {sum(scores)/len(scores):.4f}")
+                    num_boxes = result["boxes"].shape[0] if "boxes" in result else 0
+                    if num_boxes > 0:
+                        # スコアは結果ごとに一度だけCPUへ転送する
+                        scores_np = result["scores"].float().cpu().numpy()
+                        log.append(f"- クエリ {i+1}: {num_boxes}個のボックス")
+                        log.append(f"  - 最高スコア: {scores_np.max():.4f}")
+                        log.append(f"  - 平均スコア: {scores_np.mean():.4f}")
                     else:
-                        st.write(f"- クエリ {i+1}: 検出なし")
-            elif st.session_state.get('debug_mode', True):
-                st.write("- 検出されたボックス: 0個")
+                        log.append(f"- クエリ {i+1}: 検出なし")
+            elif dbg:
+                log.append("- 検出されたボックス: 0個")
             
-            if st.session_state.get('debug_mode', True):
-                st.write("✅ 後処理が完了しました")
+            if dbg:
+                log.append("✅ 後処理が完了しました")
+                st.code("\n".join(log))
             return results
         except Exception as e:
             st.error(f"結果の後処理に失敗しました: {e}")
-            if st.session_state.get('debug_mode', True):
-                st.write(f"エラーの詳細: {str(e)}")
+            if dbg:
+                log.append(f"エラーの詳細: {str(e)}")
+                st.code("\n".join(log))
             return None
+    
+    @staticmethod
+    def filter_results_by_threshold(
+        results: List[Dict[str, Any]],
+        confidence_threshold: float
+    ) -> List[Dict[str, Any]]:
+        """
+        後処理済みの結果をより高い信頼度閾値で絞り込みます
+        
+        低い閾値で一度だけ後処理した結果を再利用できるため、
+        閾値ごとに後処理をやり直す必要がありません。
+        
+        Args:
+            results: 後処理された結果
+            confidence_threshold: 信頼度の閾値
+            
+        Returns:
+            閾値を超えるスコアの検出のみを含む結果
+        """
+        filtered_results = []
+        for result in results:
+            # post_process_object_detectionと同じく閾値より大きいスコアを残す
+            keep = result["scores"] > confidence_threshold
+            filtered_results.append({key: value[keep] for key, value in result.items()})
+        return filtered_results
+    
+    @staticmethod
+    def _preprocess_image(processor: Any, image: Image.Image) -> Dict[str, Any]:
+        """
+        画像をモデル入力用に前処理します（Streamlit APIを呼ばないためスレッドから実行可能）
+        
+        Args:
+            processor: OWL-ViTプロセッサー
+            image: 入力画像
+            
+        Returns:
+            pixel_valuesを含むプロセッサーの出力
+        """
+        image = ModelLoader.resize_to_input_size(processor, image)
+        return processor(images=image, return_tensors="pt", do_resize=False)
+    
+    @staticmethod
+    def run_batch_detection(
+        model: OwlViTForObjectDetection,
+        processor: Any,
+        images: List[Image.Image],
+        text_queries: List[str],
+        confidence_threshold: float = 0.1,
+        max_concurrency: int = 4
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        複数の画像に対してテキストガイド検出を実行します
+        
+        画像の前処理（CPU）をスレッドで並行実行し、前処理の済んだ画像から順に
+        推論することで、残りの画像の前処理とGPUでの推論を重ねます。
+        推論自体はイベントループのスレッドで1枚ずつ、現在のCUDAストリーム上で実行します
+        （CUDA Graphsでコンパイルしたモデルを複数のスレッドやストリームから同時に呼ばないため）。
+        
+        Args:
+            model: OWL-ViTモデル
+            processor: OWL-ViTプロセッサー
+            images: 入力画像のリスト
+            text_queries: 正規化されたテキストクエリのリスト
+            confidence_threshold: 信頼度の閾値
+            max_concurrency: 同時に前処理する画像の最大数
+            
+        Returns:
+            画像ごとの後処理された結果のリスト、失敗した画像はNone
+        """
+        return asyncio.run(
+            DetectionProcessor._run_batch_detection_async(
+                model, processor, images, text_queries, confidence_threshold, max_concurrency
+            )
+        )
+    
+    @staticmethod
+    async def _run_batch_detection_async(
+        model: OwlViTForObjectDetection,
+        processor: Any,
+        images: List[Image.Image],
+        text_queries: List[str],
+        confidence_threshold: float,
+        max_concurrency: int
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """run_batch_detectionの非同期実装"""
+        loop = asyncio.get_running_loop()
+        device = ModelLoader.get_device(model)
+        dtype = ModelLoader.get_dtype(model)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        # テキストはすべての画像で共通のため一度だけトークン化
+        text_inputs = processor(
+            text=text_queries,
+            return_tensors="pt",
+            padding="longest",
+            truncation=True,
+            max_length=TextQueryProcessor.MAX_TOKEN_LENGTH
+        )
+        
+        async def _preprocess(image: Image.Image) -> Dict[str, Any]:
+            async with semaphore:
+                return await loop.run_in_executor(
+                    None, DetectionProcessor._preprocess_image, processor, image
+                )
+        
+        # すべての画像の前処理を先に投入し、推論中もバックグラウンドで進める
+        pending = [asyncio.ensure_future(_preprocess(image)) for image in images]
+        
+        results = []
+        for index, (image, future) in enumerate(zip(images, pending)):
+            try:
+                image_inputs = await future
+                # 転送と推論は同じ（現在の）ストリームで行うため、非同期コピーの完了を待つ必要はない
+                inputs = DetectionProcessor.move_inputs_to_device(
+                    {**text_inputs, **image_inputs}, device, dtype
+                )
+                target_sizes = DetectionProcessor.get_target_sizes(image, device)
+                
+                with torch.inference_mode(), ModelLoader.autocast_context(device):
+                    outputs = model(**inputs)
+                    image_results = processor.post_process_object_detection(
+                        outputs=outputs,
+                        threshold=confidence_threshold,
+                        target_sizes=target_sizes
+                    )
+                results.append(DetectionProcessor.move_results_to_cpu(image_results))
+            except Exception as e:
+                st.error(f"画像 {index + 1} の検出に失敗しました: {e}")
+                results.append(None)
+        return results
 
 
 class ImageGuidedDetectionProcessor:
@@ -332,10 +1127,12 @@ class ImageGuidedDetectionProcessor:
             準備された入力、失敗時はNone
         """
         try:
+            # PILで入力サイズに一度だけリサイズし、プロセッサーでのリサイズは省略する
             inputs = processor(
-                images=image,
-                query_images=query_image,
-                return_tensors="pt"
+                images=ModelLoader.resize_to_input_size(processor, image),
+                query_images=ModelLoader.resize_to_input_size(processor, query_image),
+                return_tensors="pt",
+                do_resize=False
             )
             return inputs
         except Exception as e:
@@ -358,7 +1155,8 @@ class ImageGuidedDetectionProcessor:
             推論結果、失敗時はNone
         """
         try:
-            with torch.no_grad():
+            device = ModelLoader.get_device(model)
+            with torch.inference_mode(), ModelLoader.autocast_context(device):
                 outputs = model.image_guided_detection(**inputs)
             return outputs
         except Exception as e:
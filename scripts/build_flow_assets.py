@@ -0,0 +1,29 @@
+"""
+処理フロー図を事前に描画するスクリプト
+静的な図をPNGとしてassets/に保存し、アプリの実行時にmatplotlibで描画しないようにする
+
+使い方（リポジトリのルートで実行）:
+    python scripts/build_flow_assets.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from visualization import FlowVisualizationManager
+
+
+def main() -> None:
+    """matplotlibで作成するすべての処理フロー図をPNGとして保存します"""
+    os.makedirs(FlowVisualizationManager.ASSET_DIR, exist_ok=True)
+    
+    for viz_type, (build_figure, _) in FlowVisualizationManager.FLOW_DIAGRAMS.items():
+        path = FlowVisualizationManager.asset_path(viz_type)
+        # 実行時にその場で描画するプレビューと同じ解像度で保存する
+        build_figure().savefig(path, dpi=FlowVisualizationManager.PREVIEW_DPI, bbox_inches='tight')
+        print(f"✅ {viz_type}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,20 @@ OWL-ViTの検出精度向上のため、日本語クエリを英語に翻訳
 import streamlit as st
 import requests
 import json
+import re
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Optional
 
 
+# 翻訳APIへの接続を使い回し、呼び出しごとのTCP/TLSハンドシェイクを省く
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=1))
+
+# 翻訳APIのタイムアウト（接続, 読み込み）
+_API_TIMEOUT = (3, 7)
+
+
 class JapaneseTranslator:
     """日本語クエリの翻訳を担当するクラス"""
     
@@ -142,6 +153,13 @@ class JapaneseTranslator:
         "くさ": "grass",
     }
     
+    # 部分一致検索用の正規表現（クラスの読み込み時に一度だけ構築）
+    # 長い語句を先に並べる（同じ長さでは辞書の定義順を保つ）ことで、各位置で最長の語句に一致させる
+    _DICT_ORDER = {jp: i for i, jp in enumerate(TRANSLATION_DICT)}
+    _DICT_RE = re.compile("(?=({}))".format("|".join(
+        map(re.escape, sorted(TRANSLATION_DICT, key=len, reverse=True))
+    )))
+    
     @staticmethod
     def translate_japanese_to_english(japanese_query: str, use_api: bool = False) -> str:
         """
@@ -154,15 +172,10 @@ class JapaneseTranslator:
         Returns:
             英語に翻訳されたクエリ
         """
-        # 翻訳辞書から検索（完全一致）
-        if japanese_query in JapaneseTranslator.TRANSLATION_DICT:
-            return JapaneseTranslator.TRANSLATION_DICT[japanese_query]
-        
-        # 長い語句から順に部分一致で検索（複合語を優先）
-        sorted_items = sorted(JapaneseTranslator.TRANSLATION_DICT.items(), key=lambda x: len(x[0]), reverse=True)
-        for jp, en in sorted_items:
-            if jp in japanese_query:
-                return en
+        # 辞書翻訳の結果は変わらないためキャッシュする
+        dict_translation = JapaneseTranslator._translate_with_dict(japanese_query)
+        if dict_translation is not None:
+            return dict_translation
         
         # 外部APIを使用する場合
         if use_api:
@@ -173,6 +186,31 @@ class JapaneseTranslator:
         # 翻訳できない場合は元のクエリを返す
         return japanese_query
     
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _translate_with_dict(japanese_query: str) -> Optional[str]:
+        """
+        翻訳辞書を使用して翻訳します（キャッシュ付き）
+        
+        Args:
+            japanese_query: 日本語クエリ
+            
+        Returns:
+            翻訳結果、辞書に一致する語句がない場合はNone
+        """
+        # 翻訳辞書から検索（完全一致）
+        if japanese_query in JapaneseTranslator.TRANSLATION_DICT:
+            return JapaneseTranslator.TRANSLATION_DICT[japanese_query]
+        
+        # 部分一致で最も長い語句を検索（複合語を優先）
+        # 各位置で一致する最長の語句を先読みで列挙し、その中から最長のものを選ぶ
+        # （同じ長さの場合は辞書で先に定義されたもの）
+        matches = [match.group(1) for match in JapaneseTranslator._DICT_RE.finditer(japanese_query)]
+        if not matches:
+            return None
+        longest = max(matches, key=lambda jp: (len(jp), -JapaneseTranslator._DICT_ORDER[jp]))
+        return JapaneseTranslator.TRANSLATION_DICT[longest]
+    
     @staticmethod
     def _translate_with_api(japanese_query: str) -> Optional[str]:
         """
@@ -195,7 +233,7 @@ class JapaneseTranslator:
                 "q": japanese_query
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = _SESSION.get(url, params=params, timeout=_API_TIMEOUT)
             
             if response.status_code == 200:
                 try:
@@ -219,6 +257,92 @@ class JapaneseTranslator:
         
         return None
     
+    @staticmethod
+    def _translate_batch_with_api(japanese_queries: List[str]) -> List[Optional[str]]:
+        """
+        外部APIを使用して複数のクエリを1回のリクエストで翻訳します
+        
+        クエリを改行で連結して送信し、応答の各セグメントを改行で分割して元のクエリに対応付けます。
+        
+        Args:
+            japanese_queries: 日本語クエリのリスト
+            
+        Returns:
+            クエリごとの翻訳結果のリスト（失敗したクエリはNone）
+        """
+        if not japanese_queries:
+            return []
+        if len(japanese_queries) == 1:
+            return [JapaneseTranslator._translate_with_api(japanese_queries[0])]
+        
+        try:
+            url = "https://translate.googleapis.com/translate_a/single"
+            params = {
+                "client": "gtx",
+                "sl": "ja",
+                "tl": "en",
+                "dt": "t",
+                "q": "\n".join(japanese_queries)
+            }
+            
+            response = _SESSION.get(url, params=params, timeout=_API_TIMEOUT)
+            
+            if response.status_code == 200:
+                try:
+                    # 各セグメントの翻訳を連結してから改行で元のクエリごとに分割
+                    result = response.json()
+                    translated_text = "".join(segment[0] for segment in result[0] if segment[0])
+                    translated_lines = [line.strip() for line in translated_text.split("\n")]
+                    if len(translated_lines) == len(japanese_queries):
+                        return [
+                            translated if translated and translated != query else None
+                            for query, translated in zip(japanese_queries, translated_lines)
+                        ]
+                    st.warning("翻訳APIの応答を各クエリに分割できませんでした")
+                except (json.JSONDecodeError, IndexError, KeyError, TypeError):
+                    st.warning("翻訳APIの応答形式が不正です")
+            else:
+                st.warning(f"翻訳APIの応答エラー: {response.status_code}")
+            
+        except requests.exceptions.Timeout:
+            st.warning("翻訳APIのタイムアウトが発生しました")
+        except requests.exceptions.RequestException as e:
+            st.warning(f"翻訳APIの通信エラー: {e}")
+        except Exception as e:
+            st.warning(f"外部翻訳APIの使用に失敗しました: {e}")
+        
+        return [None] * len(japanese_queries)
+    
+    @staticmethod
+    def translate_queries(japanese_queries: List[str], use_api: bool = False) -> List[str]:
+        """
+        複数の日本語クエリを英語に翻訳します
+        
+        辞書で翻訳できなかったクエリのみをまとめて外部APIに送信します。
+        
+        Args:
+            japanese_queries: 日本語クエリのリスト
+            use_api: 外部APIを使用するかどうか
+            
+        Returns:
+            英語に翻訳されたクエリのリスト（翻訳できない場合は元のクエリ）
+        """
+        translations = [
+            JapaneseTranslator._translate_with_dict(query) or query
+            for query in japanese_queries
+        ]
+        
+        if use_api:
+            pending = [i for i, query in enumerate(japanese_queries) if translations[i] == query]
+            api_translations = JapaneseTranslator._translate_batch_with_api(
+                [japanese_queries[i] for i in pending]
+            )
+            for i, api_translation in zip(pending, api_translations):
+                if api_translation:
+                    translations[i] = api_translation
+        
+        return translations
+    
     @staticmethod
     def translate_with_multiple_methods(japanese_query: str) -> List[str]:
         """
@@ -252,6 +376,7 @@ class JapaneseTranslator:
         return translations
     
     @staticmethod
+    @lru_cache(maxsize=1024)
     def is_japanese(text: str) -> bool:
         """
         テキストが日本語かどうかを判定します
@@ -262,11 +387,10 @@ class JapaneseTranslator:
         Returns:
             日本語の場合True
         """
-        # ひらがな、カタカナ、漢字が含まれているかチェック
-        for char in text:
-            if ord(char) > 127:
-                return True
-        return False
+        # ひらがな、カタカナ、漢字などASCII以外の文字が含まれているかチェック
+        # （str.isasciiは文字列生成時に記録された最大文字コードを見るだけなので、
+        #   長さによらず一定時間で判定できる）
+        return not text.isascii()
     
     @staticmethod
     def get_multiple_query_variations(query: str, use_api: bool = True) -> List[str]:
@@ -280,42 +404,45 @@ class JapaneseTranslator:
         Returns:
             クエリのバリエーションリスト
         """
-        variations = [query]
+        # 追加時に重複を除く（順序は追加した順のまま）
+        variations = []
+        seen = set()
+        
+        def add(variation: str) -> None:
+            if variation not in seen:
+                seen.add(variation)
+                variations.append(variation)
+        
+        add(query)
         
         # 日本語の場合、複数の翻訳方法を試す
         if JapaneseTranslator.is_japanese(query):
             if use_api:
                 # 複数の翻訳方法を使用
-                translations = JapaneseTranslator.translate_with_multiple_methods(query)
-                for translation in translations:
-                    if translation not in variations:
-                        variations.append(translation)
+                for translation in JapaneseTranslator.translate_with_multiple_methods(query):
+                    add(translation)
             else:
                 # 辞書翻訳のみ
-                english_translation = JapaneseTranslator.translate_japanese_to_english(query, use_api=False)
-                if english_translation != query:
-                    variations.append(english_translation)
+                add(JapaneseTranslator.translate_japanese_to_english(query, use_api=False))
         
         # 英語の場合、複数の形式を試す
         else:
             # 単数形・複数形のバリエーション
             if query.endswith('s'):
-                variations.append(query[:-1])  # 複数形→単数形
+                add(query[:-1])  # 複数形→単数形
             else:
-                variations.append(query + 's')  # 単数形→複数形
+                add(query + 's')  # 単数形→複数形
         
             # より多くの英語バリエーションを追加
             if not query.startswith('a ') and not query.startswith('the '):
-                variations.extend([
+                for variation in (
                     f"a {query}",
                     f"the {query}",
                     f"a photo of {query}",
                     f"a photo of a {query}",
                     f"an image of {query}",
                     f"an image of a {query}"
-                ])
-        
-        # 重複を除去
-        unique_variations = list(dict.fromkeys(variations))
+                ):
+                    add(variation)
         
-        return unique_variations 
\ No newline at end of file
+        return variations 
\ No newline at end of file
@@ -3,10 +3,129 @@ UIコンポーネントを管理するモジュール
 単一責任原則に従い、StreamlitのUI要素を提供
 """
 
+import io
+import pandas as pd
 import streamlit as st
+import torch
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from typing import List, Optional, Tuple
 from PIL import Image
 
+# カスタムモジュールのインポート
+from image_processor import ImageLoader, ImageValidator, ImagePreprocessor, ImageVisualizer
+from model_manager import ModelLoader, TextQueryProcessor
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+# 画像のダウンロードやPNGエンコードをスクリプトの実行スレッドから切り離すためのスレッドプール
+_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+# サンプル画像の先読み用のFuture（URLごと、全セッションで共有）
+# 取得済みの画像は各セッションのsession_state["sample_images"]から返すため、再実行ではcache_dataのハッシュ計算を行わない
+_SAMPLE_PREFETCH = {}
+_SAMPLE_PREFETCH_LOCK = threading.Lock()
+
+# 再実行のたびに辞書を作り直さないよう、固定のデータはモジュールの読み込み時に一度だけ作成する
+
+# サンプル画像
+_SAMPLE_IMAGES = MappingProxyType({
+    "オフィスシーン": "https://images.unsplash.com/photo-1497366216548-37526070297c?w=800&h=600&fit=crop",
+    "キッチンシーン": "https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=800&h=600&fit=crop",
+    "リビングルーム": "https://images.unsplash.com/photo-1586023492125-27b2c045efd7?w=800&h=600&fit=crop",
+    "街並み": "https://images.unsplash.com/photo-1449824913935-59a10b8d2000?w=800&h=600&fit=crop",
+    "自然風景": "https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=800&h=600&fit=crop"
+})
+
+# クエリ提案用の辞書
+_QUERY_DICT = MappingProxyType({
+    "猫": ("cat", "kitten", "feline", "ペット"),
+    "犬": ("dog", "puppy", "canine", "ペット"),
+    "車": ("car", "automobile", "vehicle", "乗り物"),
+    "人": ("person", "human", "people", "人物"),
+    "椅子": ("chair", "seat", "furniture", "家具"),
+    "テーブル": ("table", "desk", "furniture", "家具"),
+    "テレビ": ("television", "tv", "electronics", "電子機器"),
+    "スマートフォン": ("smartphone", "phone", "mobile", "電子機器"),
+    "りんご": ("apple", "fruit", "food", "食べ物"),
+    "ピザ": ("pizza", "food", "meal", "食べ物"),
+    "本": ("book", "reading", "literature", "書籍"),
+    "花": ("flower", "plant", "nature", "植物"),
+    "木": ("tree", "plant", "nature", "植物"),
+    "建物": ("building", "house", "architecture", "建築"),
+    "空": ("sky", "cloud", "weather", "天気"),
+    "海": ("sea", "ocean", "water", "自然"),
+    "山": ("mountain", "hill", "nature", "自然")
+})
+
+# クエリ提案の照合用に小文字化したキーと値
+_QUERY_DICT_LOWER = MappingProxyType({
+    key: (key.lower(), tuple(value.lower() for value in values))
+    for key, values in _QUERY_DICT.items()
+})
+
+
+def _build_suggestion_indexes() -> Tuple[MappingProxyType, MappingProxyType, int]:
+    """
+    クエリ提案用の転置インデックスを構築します
+    
+    Returns:
+        (キー・値の部分文字列→エントリ, 値→エントリ, 値の最大長) のタプル
+    """
+    substring_index = {}
+    value_index = {}
+    for key, (key_lower, values_lower) in _QUERY_DICT_LOWER.items():
+        for text in (key_lower,) + values_lower:
+            for start in range(len(text)):
+                for end in range(start + 1, len(text) + 1):
+                    substring_index.setdefault(text[start:end], set()).add(key)
+        for value in values_lower:
+            value_index.setdefault(value, set()).add(key)
+    
+    max_value_length = max(len(value) for value in value_index)
+    return (
+        MappingProxyType({text: frozenset(keys) for text, keys in substring_index.items()}),
+        MappingProxyType({value: frozenset(keys) for value, keys in value_index.items()}),
+        max_value_length
+    )
+
+
+# クエリがキー・値の部分文字列となるエントリ、クエリに含まれる値のエントリをそれぞれ引くためのインデックス
+_SUGGEST_INDEX, _SUGGEST_VALUE_INDEX, _MAX_SUGGEST_VALUE_LENGTH = _build_suggestion_indexes()
+
+
+def _build_suggestion_automaton():
+    """
+    クエリに含まれる値を一度の走査で見つけるためのAho-Corasickオートマトンを構築します
+    
+    Returns:
+        構築済みのオートマトン、pyahocorasickが利用できない場合はNone
+    """
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for value, keys in _SUGGEST_VALUE_INDEX.items():
+        automaton.add_word(value, keys)
+    automaton.make_automaton()
+    return automaton
+
+
+_SUGGEST_AUTOMATON = _build_suggestion_automaton()
+
+# カテゴリ別のプリセットクエリ
+_PRESET_CATEGORIES = MappingProxyType({
+    "動物": ("cat", "dog", "bird", "horse", "fish", "猫", "犬", "鳥", "馬", "魚"),
+    "乗り物": ("car", "bicycle", "motorcycle", "bus", "train", "車", "自転車", "バイク", "バス", "電車"),
+    "家具": ("chair", "table", "sofa", "bed", "desk", "椅子", "テーブル", "ソファ", "ベッド", "机"),
+    "食べ物": ("apple", "banana", "pizza", "cake", "bread", "りんご", "バナナ", "ピザ", "ケーキ", "パン"),
+    "電子機器": ("television", "computer", "smartphone", "camera", "テレビ", "パソコン", "スマートフォン", "カメラ")
+})
+
 
 class SidebarManager:
     """サイドバーの管理を担当するクラス"""
@@ -21,7 +140,6 @@ class SidebarManager:
         """
         st.sidebar.header("🔧 設定")
         
-        from model_manager import ModelLoader
         available_models = ModelLoader.get_available_models()
         
         selected_model = st.sidebar.selectbox(
@@ -80,7 +198,7 @@ class SidebarManager:
         # デバッグモードの追加
         debug_mode = st.sidebar.checkbox(
             "デバッグモード",
-            value=True,  # デフォルトで有効
+            value=False,  # デフォルトで無効（一般の利用者にはデバッグ情報を表示しない）
             help="詳細なデバッグ情報を表示"
         )
         
@@ -131,20 +249,27 @@ class InputManager:
             ["サンプル画像を使用", "画像をアップロード", "URLから画像を取得", "カメラで撮影"]
         )
         
-        image = None
+        image, source_key = None, None
         
         if input_method == "サンプル画像を使用":
-            image = InputManager._load_sample_image()
+            image, source_key = InputManager._load_sample_image()
         elif input_method == "画像をアップロード":
-            image = InputManager._load_uploaded_image()
+            image, source_key = InputManager._load_uploaded_image()
         elif input_method == "URLから画像を取得":
-            image = InputManager._load_url_image()
+            image, source_key = InputManager._load_url_image()
         elif input_method == "カメラで撮影":
-            image = InputManager._load_camera_image()
+            image, source_key = InputManager._load_camera_image()
         
         if image:
             st.success("画像が正常に読み込まれました")
-            st.image(image, caption="入力画像", use_container_width=True)
+            # 検出には元の画像を使い、表示には縮小したサムネイルだけを送る
+            # （PNGのまま配信させ、再実行のたびにJPEGへ再エンコードされないようにする）
+            st.image(
+                InputManager._thumbnail_png(source_key, image),
+                caption="入力画像",
+                use_container_width=True,
+                output_format="PNG"
+            )
             
             # 画像情報の表示
             col1, col2, col3 = st.columns(3)
@@ -161,117 +286,156 @@ class InputManager:
         return None
     
     @staticmethod
-    def _load_sample_image() -> Optional[Image.Image]:
-        """サンプル画像を読み込みます"""
-        import requests
-        from io import BytesIO
-        
-        # サンプル画像の選択
-        sample_images = {
-            "オフィスシーン": "https://images.unsplash.com/photo-1497366216548-37526070297c?w=800&h=600&fit=crop",
-            "キッチンシーン": "https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=800&h=600&fit=crop",
-            "リビングルーム": "https://images.unsplash.com/photo-1586023492125-27b2c045efd7?w=800&h=600&fit=crop",
-            "街並み": "https://images.unsplash.com/photo-1449824913935-59a10b8d2000?w=800&h=600&fit=crop",
-            "自然風景": "https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=800&h=600&fit=crop"
-        }
+    @st.cache_data(show_spinner=False, max_entries=4)
+    def _thumbnail_png(source_key: str, _image: Image.Image) -> bytes:
+        """
+        表示用に縮小したサムネイルをPNG形式で作成します（キャッシュ付き）
+        
+        画素データではなく画像の取得元（URLやアップロードファイルのID）をキーにするため、
+        再実行のたびに画像全体をハッシュしません。
+        
+        Args:
+            source_key: 画像の取得元を表すキー
+            _image: 元の画像（キャッシュキーには含めない）
+            
+        Returns:
+            長辺が最大1024pxのサムネイルのPNGバイト列
+        """
+        # CMYKなどPNGに保存できないモードやパレット画像も正しく表示できるよう、RGB(A)に変換する
+        has_alpha = "A" in _image.getbands() or "transparency" in _image.info
+        thumbnail = _image.convert("RGBA" if has_alpha else "RGB")
+        # 表示用なので、画質よりも縮小速度を優先してBILINEARを使う
+        thumbnail.thumbnail((1024, 1024), Image.BILINEAR)
+        return ResultsManager._png_bytes(thumbnail)
+    
+    @staticmethod
+    def _load_sample_image() -> Tuple[Optional[Image.Image], Optional[str]]:
+        """サンプル画像を読み込みます（画像と取得元のキーを返します）"""
         
         selected_image = st.selectbox(
             "サンプル画像を選択",
-            list(sample_images.keys())
+            list(_SAMPLE_IMAGES.keys())
         )
         
+        # すべてのサンプル画像をバックグラウンドで先読みし、切り替え時に待たないようにする
+        # （ワーカースレッドではStreamlit APIを呼ばないdownload_imageを使う）
+        with _SAMPLE_PREFETCH_LOCK:
+            for url in _SAMPLE_IMAGES.values():
+                if url not in _SAMPLE_PREFETCH:
+                    _SAMPLE_PREFETCH[url] = _EXECUTOR.submit(ImageLoader.download_image, url)
+        
         if selected_image:
+            url = _SAMPLE_IMAGES[selected_image]
+            # 一度取得した画像はセッションに保持し、再実行ではそのまま返す
+            sample_images = st.session_state.setdefault("sample_images", {})
+            if url in sample_images:
+                return sample_images[url], f"url:{url}"
             try:
-                url = sample_images[selected_image]
-                response = requests.get(url, timeout=10)
-                response.raise_for_status()
-                image = Image.open(BytesIO(response.content))
-                return image
+                # 読み込み済みであれば即座に、ダウンロード中であれば完了を待って取得
+                sample_images[url] = _SAMPLE_PREFETCH[url].result(timeout=15)
+                return sample_images[url], f"url:{url}"
             except Exception as e:
+                # 失敗した場合は次回の実行で再試行する
+                with _SAMPLE_PREFETCH_LOCK:
+                    _SAMPLE_PREFETCH.pop(url, None)
                 st.error(f"サンプル画像の読み込みに失敗しました: {e}")
-                return None
+                return None, None
         
-        return None
+        return None, None
     
     @staticmethod
-    def _load_uploaded_image() -> Optional[Image.Image]:
-        """アップロードされた画像を読み込みます"""
+    def _load_uploaded_image() -> Tuple[Optional[Image.Image], Optional[str]]:
+        """アップロードされた画像を読み込みます（画像と取得元のキーを返します）"""
         uploaded_file = st.file_uploader(
             "画像ファイルを選択してください",
             type=['png', 'jpg', 'jpeg', 'bmp', 'tiff']
         )
         
         if uploaded_file is not None:
-            from image_processor import ImageLoader
-            return ImageLoader.load_from_upload(uploaded_file)
+            return ImageLoader.load_from_upload(uploaded_file), f"file:{uploaded_file.file_id}"
         
-        return None
+        return None, None
+    
+    @staticmethod
+    def create_batch_image_section() -> List[Image.Image]:
+        """
+        複数画像の一括検出用の画像入力UIを作成します
+        
+        Returns:
+            読み込まれた画像のリスト（読み込みに失敗したファイルは含まない）
+        """
+        uploaded_files = st.file_uploader(
+            "一括検出する画像ファイルを選択してください（複数選択可）",
+            type=['png', 'jpg', 'jpeg', 'bmp', 'tiff'],
+            accept_multiple_files=True,
+            key="batch_image_files"
+        )
+        
+        # decode_uploadedのキャッシュは数件分しかないため、一括検出用の画像はファイルIDごとにセッションに保持し、
+        # 再実行のたびにすべてのファイルを展開し直さないようにする（選択から外れたファイルは破棄する）
+        cached_images = st.session_state.get("batch_images", {})
+        batch_images = {}
+        for uploaded_file in uploaded_files or []:
+            image = cached_images.get(uploaded_file.file_id)
+            if image is None:
+                image = ImageLoader.load_from_upload(uploaded_file)
+                if image is None:
+                    continue
+                image = ImagePreprocessor.convert_to_rgb(image)
+            batch_images[uploaded_file.file_id] = image
+        st.session_state["batch_images"] = batch_images
+        return list(batch_images.values())
     
     @staticmethod
-    def _load_url_image() -> Optional[Image.Image]:
-        """URLから画像を読み込みます"""
+    def _load_url_image() -> Tuple[Optional[Image.Image], Optional[str]]:
+        """URLから画像を読み込みます（画像と取得元のキーを返します）"""
         image_url = st.text_input(
             "画像のURLを入力してください",
             value="http://images.cocodataset.org/val2017/000000039769.jpg"
         )
         
         if image_url:
-            from image_processor import ImageLoader
-            return ImageLoader.load_from_url(image_url)
+            return ImageLoader.load_from_url(image_url), f"url:{image_url}"
         
-        return None
+        return None, None
     
     @staticmethod
-    def _load_camera_image() -> Optional[Image.Image]:
-        """カメラで撮影した画像を読み込みます"""
+    def _load_camera_image() -> Tuple[Optional[Image.Image], Optional[str]]:
+        """カメラで撮影した画像を読み込みます（画像と取得元のキーを返します）"""
         try:
             camera_input = st.camera_input("カメラで撮影")
             if camera_input is not None:
-                return Image.open(camera_input)
-            return None
+                image = ImageLoader.decode_uploaded(camera_input.file_id, camera_input.getvalue())
+                return image, f"file:{camera_input.file_id}"
+            return None, None
         except Exception as e:
             st.error(f"カメラからの画像読み込みに失敗しました: {e}")
-            return None
+            return None, None
     
     @staticmethod
     def _get_query_suggestions(query: str) -> List[str]:
         """クエリの提案を取得します"""
-        # クエリ辞書
-        query_dict = {
-            "猫": ["cat", "kitten", "feline", "ペット"],
-            "犬": ["dog", "puppy", "canine", "ペット"],
-            "車": ["car", "automobile", "vehicle", "乗り物"],
-            "人": ["person", "human", "people", "人物"],
-            "椅子": ["chair", "seat", "furniture", "家具"],
-            "テーブル": ["table", "desk", "furniture", "家具"],
-            "テレビ": ["television", "tv", "electronics", "電子機器"],
-            "スマートフォン": ["smartphone", "phone", "mobile", "電子機器"],
-            "りんご": ["apple", "fruit", "food", "食べ物"],
-            "ピザ": ["pizza", "food", "meal", "食べ物"],
-            "本": ["book", "reading", "literature", "書籍"],
-            "花": ["flower", "plant", "nature", "植物"],
-            "木": ["tree", "plant", "nature", "植物"],
-            "建物": ["building", "house", "architecture", "建築"],
-            "空": ["sky", "cloud", "weather", "天気"],
-            "海": ["sea", "ocean", "water", "自然"],
-            "山": ["mountain", "hill", "nature", "自然"]
-        }
-        
-        suggestions = []
         query_lower = query.lower()
         
-        # 完全一致
-        for key, values in query_dict.items():
-            if query_lower in key.lower() or any(query_lower in v.lower() for v in values):
-                suggestions.extend(values)
+        # クエリがキーまたは値の一部に一致するエントリ
+        matched_keys = set(_SUGGEST_INDEX.get(query_lower, ()))
         
-        # 部分一致
-        for key, values in query_dict.items():
-            if any(query_lower in v.lower() for v in values) or any(v.lower() in query_lower for v in values):
-                suggestions.extend(values)
+        # 値がクエリの一部に含まれるエントリ
+        if _SUGGEST_AUTOMATON is not None:
+            # クエリを一度走査するだけで、含まれるすべての値が見つかる
+            for _, keys in _SUGGEST_AUTOMATON.iter(query_lower):
+                matched_keys.update(keys)
+        else:
+            # クエリの部分文字列を値の最大長まで調べる
+            for start in range(len(query_lower)):
+                for end in range(start + 1, min(len(query_lower), start + _MAX_SUGGEST_VALUE_LENGTH) + 1):
+                    matched_keys.update(_SUGGEST_VALUE_INDEX.get(query_lower[start:end], ()))
+        
+        # 辞書の定義順に並べ、再実行のたびに提案の順序が入れ替わらないようにする
+        suggestions = [value for key in _QUERY_DICT if key in matched_keys for value in _QUERY_DICT[key]]
         
-        # 重複を除去して返す
-        return list(set(suggestions))
+        # 順序を保ったまま重複を除去して返す
+        return list(dict.fromkeys(suggestions))
     
     @staticmethod
     def create_text_query_section() -> Optional[Tuple[List[str], str]]:
@@ -305,42 +469,39 @@ class InputManager:
                 help="検出したい物体のクエリ数を設定"
             )
             
-            for i in range(num_queries):
-                query = st.text_input(
-                    f"テキストクエリ {i+1}",
-                    placeholder="例: 猫, car, 椅子",
-                    help="検出したい物体を入力してください（日本語・英語対応）"
+            # 入力のたびに再実行しないよう、フォームで送信時にまとめて反映する
+            # （フォーム内のウィジェットは送信済みの値を返し続けるため、送信直後以外の再実行でもクエリは保持される）
+            with st.form("text_query_form", clear_on_submit=False):
+                for i in range(num_queries):
+                    query = st.text_input(
+                        f"テキストクエリ {i+1}",
+                        placeholder="例: 猫, car, 椅子",
+                        help="検出したい物体を入力してください（日本語・英語対応）"
+                    )
+                    query = query.strip()
+                    if query:
+                        text_queries.append(query)
+                
+                # 翻訳方法の選択
+                translation_method = st.selectbox(
+                    "翻訳方法",
+                    ["辞書翻訳のみ", "辞書翻訳 + API翻訳"],
+                    help="日本語クエリの翻訳方法を選択"
                 )
-                if query.strip():
-                    text_queries.append(query.strip())
-            
-            # 翻訳方法の選択
-            translation_method = st.selectbox(
-                "翻訳方法",
-                ["辞書翻訳のみ", "辞書翻訳 + API翻訳"],
-                help="日本語クエリの翻訳方法を選択"
-            )
+                
+                st.form_submit_button("クエリを確定")
         
         elif input_method == "プリセットクエリ":
             # プリセットクエリ
             st.subheader("プリセットクエリから選択")
             
-            # カテゴリ別のプリセットクエリ
-            preset_categories = {
-                "動物": ["cat", "dog", "bird", "horse", "fish", "猫", "犬", "鳥", "馬", "魚"],
-                "乗り物": ["car", "bicycle", "motorcycle", "bus", "train", "車", "自転車", "バイク", "バス", "電車"],
-                "家具": ["chair", "table", "sofa", "bed", "desk", "椅子", "テーブル", "ソファ", "ベッド", "机"],
-                "食べ物": ["apple", "banana", "pizza", "cake", "bread", "りんご", "バナナ", "ピザ", "ケーキ", "パン"],
-                "電子機器": ["television", "computer", "smartphone", "camera", "テレビ", "パソコン", "スマートフォン", "カメラ"]
-            }
-            
             selected_category = st.selectbox(
                 "カテゴリを選択",
-                list(preset_categories.keys())
+                list(_PRESET_CATEGORIES.keys())
             )
             
             if selected_category:
-                preset_queries = preset_categories[selected_category]
+                preset_queries = list(_PRESET_CATEGORIES[selected_category])
                 
                 # 複数選択可能
                 selected_queries = st.multiselect(
@@ -356,17 +517,19 @@ class InputManager:
             # テキスト検索機能
             st.subheader("テキスト検索")
             
-            # 検索ボックス
-            search_query = st.text_input(
-                "検索したい物体を入力",
-                placeholder="例: 猫, car, 椅子",
-                help="検出したい物体を入力してください（日本語・英語対応）"
+            # 検索ボックス（提案ボタンはフォーム内に置けないため、検索語の入力のみをフォームにする）
+            with st.form("text_search_form", clear_on_submit=False):
+                search_query = st.text_input(
+                    "検索したい物体を入力",
+                    placeholder="例: 猫, car, 椅子",
+                    help="検出したい物体を入力してください（日本語・英語対応）"
                 )
+                st.form_submit_button("検索")
             
             # クエリ提案機能
             if search_query.strip():
                 # 検索クエリを分割（カンマ区切り）
-                queries = [q.strip() for q in search_query.split(',') if q.strip()]
+                queries = [q for q in (q.strip() for q in search_query.split(',')) if q]
                 
                 # 検索結果の表示
                 st.write("**検索結果:**")
@@ -409,7 +572,6 @@ class InputManager:
                 st.write(f"{i+1}. **{query}**")
             
             # 検証
-            from model_manager import TextQueryProcessor
             if TextQueryProcessor.validate_text_queries(text_queries):
                 return text_queries, translation_method
             else:
@@ -433,8 +595,6 @@ class InputManager:
             ["サンプル画像を使用", "画像をアップロード", "URLから画像を取得"]
         )
         
-        from image_processor import ImageLoader, ImageValidator, ImagePreprocessor
-        
         query_image = None
         
         if input_method == "サンプル画像を使用":
@@ -462,7 +622,6 @@ class InputManager:
             
             # 画像の検証
             if ImageValidator.validate_image(query_image):
-                from image_processor import ImageVisualizer
                 ImageVisualizer.display_image_with_info(query_image, "クエリ画像")
                 return query_image
         
@@ -472,6 +631,33 @@ class InputManager:
 class ResultsManager:
     """結果表示を担当するクラス"""
     
+    @staticmethod
+    def _detections_table(
+        boxes: torch.Tensor,
+        scores: torch.Tensor,
+        confidence_threshold: float,
+        score_label: str
+    ) -> pd.DataFrame:
+        """
+        閾値以上の検出結果を表形式にまとめます
+        
+        Args:
+            boxes: バウンディングボックスのテンソル (N, 4)
+            scores: スコアのテンソル (N,)
+            confidence_threshold: 信頼度閾値
+            score_label: スコア列の列名
+            
+        Returns:
+            検出位置とスコアのDataFrame
+        """
+        # 行ごとに要素を取り出さず、配列のまま一括で絞り込みと丸めを行う
+        boxes_np = boxes.detach().cpu().numpy()
+        scores_np = scores.detach().cpu().numpy()
+        mask = scores_np >= confidence_threshold
+        table = pd.DataFrame(boxes_np[mask].round(2), columns=["x1", "y1", "x2", "y2"])
+        table[score_label] = scores_np[mask].round(3)
+        return table
+    
     @staticmethod
     def display_detection_results(
         results: List[dict],
@@ -495,7 +681,6 @@ class ResultsManager:
         for i, result in enumerate(results):
             boxes = result["boxes"]
             scores = result["scores"]
-            labels = result["labels"]
             
             if len(boxes) == 0:
                 st.info(f"クエリ '{text_queries[i]}' に対する検出結果がありません")
@@ -504,14 +689,13 @@ class ResultsManager:
             st.subheader(f"クエリ: {text_queries[i]}")
             
             # 検出結果の詳細表示
-            for box, score, label in zip(boxes, scores, labels):
-                if score >= confidence_threshold:
-                    box_coords = [round(coord, 2) for coord in box.tolist()]
-                    st.write(f"📍 検出位置: {box_coords}, 信頼度: {score:.3f}")
+            table = ResultsManager._detections_table(
+                boxes, scores, confidence_threshold, "信頼度"
+            )
+            st.dataframe(table, use_container_width=True, hide_index=True)
             
             # 統計情報
-            valid_detections = sum(1 for score in scores if score >= confidence_threshold)
-            st.metric("検出数", valid_detections)
+            st.metric("検出数", len(table))
     
     @staticmethod
     def display_image_guided_results(
@@ -542,14 +726,62 @@ class ResultsManager:
             st.subheader("類似オブジェクトの検出結果")
             
             # 検出結果の詳細表示
-            for box, score in zip(boxes, scores):
-                if score >= confidence_threshold:
-                    box_coords = [round(coord, 2) for coord in box.tolist()]
-                    st.write(f"📍 検出位置: {box_coords}, 類似度: {score:.3f}")
+            table = ResultsManager._detections_table(
+                boxes, scores, confidence_threshold, "類似度"
+            )
+            st.dataframe(table, use_container_width=True, hide_index=True)
             
             # 統計情報
-            valid_detections = sum(1 for score in scores if score >= confidence_threshold)
-            st.metric("検出数", valid_detections)
+            st.metric("検出数", len(table))
+    
+    @staticmethod
+    def _png_bytes(image: Image.Image) -> bytes:
+        """
+        画像をPNG形式にエンコードします（スレッドから実行可能）
+        
+        Args:
+            image: エンコードする画像
+            
+        Returns:
+            PNG形式のバイト列
+        """
+        img_buffer = io.BytesIO()
+        # 圧縮率よりエンコード速度を優先する
+        image.save(img_buffer, format='PNG', optimize=False, compress_level=1)
+        # getvalue()は内部バッファをそのまま共有して返すため、ここでコピーは発生しない
+        # （bytes(getbuffer())の方がかえって全体をコピーする）
+        return img_buffer.getvalue()
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=4)
+    def _encode_png(image_bytes: bytes, size: Tuple[int, int], mode: str) -> bytes:
+        """
+        画像をPNG形式にエンコードします（キャッシュ付き）
+        
+        Args:
+            image_bytes: 画像の画素データ
+            size: 画像のサイズ (width, height)
+            mode: 画像のモード
+            
+        Returns:
+            PNG形式のバイト列
+        """
+        return ResultsManager._png_bytes(Image.frombytes(mode, size, image_bytes))
+    
+    @staticmethod
+    def start_png_encode(visualized_image: Image.Image) -> None:
+        """
+        ダウンロード用のPNGエンコードをバックグラウンドで開始します
+        
+        結果画像の表示と並行してエンコードし、create_download_sectionで結果を受け取ります。
+        
+        Args:
+            visualized_image: 可視化された画像
+        """
+        st.session_state["download_png_future"] = (
+            visualized_image,
+            _EXECUTOR.submit(ResultsManager._png_bytes, visualized_image)
+        )
     
     @staticmethod
     def create_download_section(visualized_image: Image.Image) -> None:
@@ -562,13 +794,18 @@ class ResultsManager:
         st.header("💾 結果のダウンロード")
         
         # 画像をバイト形式に変換
-        import io
-        img_buffer = io.BytesIO()
-        visualized_image.save(img_buffer, format='PNG')
+        # バックグラウンドでエンコード中であればその結果を、なければキャッシュを使用する
+        pending = st.session_state.pop("download_png_future", None)
+        if pending is not None and pending[0] is visualized_image:
+            png_bytes = pending[1].result()
+        else:
+            png_bytes = ResultsManager._encode_png(
+                visualized_image.tobytes(), visualized_image.size, visualized_image.mode
+            )
         
         st.download_button(
             label="検出結果画像をダウンロード",
-            data=img_buffer.getvalue(),
+            data=png_bytes,
             file_name="owl_vit_detection_result.png",
             mime="image/png"
         ) 
\ No newline at end of file
@@ -3,33 +3,97 @@ OWL-ViTの処理フロー可視化モジュール
 画像→ViTトークン→スコアマップ→検出の流れを視覚的に表現
 """
 
+import io
+import os
 import streamlit as st
-import matplotlib.pyplot as plt
+import matplotlib
+import pandas as pd
 import matplotlib.patches as patches
+from matplotlib.collections import LineCollection, PatchCollection, PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties, fontManager
+import plotly.graph_objects as go
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
-import torch
 from typing import List, Tuple, Optional, Dict, Any
-import seaborn as sns
+
+
+# 日本語フォントの設定（モジュールの読み込み時に一度だけ行う。
+# 以降に作成するFontPropertiesがこの設定を引き継ぐため、定数の定義より前に設定する）
+matplotlib.rcParams['font.family'] = ['DejaVu Sans', 'Hiragino Sans', 'Yu Gothic', 'Meiryo', 'Takao', 'IPAexGothic', 'IPAPGothic', 'VL PGothic', 'Noto Sans CJK JP']
+
+# ラベルの背景（呼び出しごとに辞書やフォント設定を作り直さないよう共有する）
+_BOX_WHITE = dict(boxstyle="round,pad=0.2", facecolor='white', alpha=0.8)
+
+# Plotlyの注釈で使うラベルの背景
+_PLOTLY_BOX_WHITE = dict(bgcolor='rgba(255, 255, 255, 0.8)', borderpad=3)
+_PLOTLY_BOX_GRAY = dict(bgcolor='rgba(233, 236, 239, 0.8)', borderpad=3)
+
+# 矢印のラベルのフォント
+_FP_CAPTION = FontProperties(size=9)
+
+# 初回描画時のフォント探索を先に済ませ、結果をフォントマネージャーのキャッシュに載せておく
+fontManager.findfont(_FP_CAPTION)
+
+# 説明欄に表示する技術仕様と処理時間の目安
+_SPEC_TABLE = pd.DataFrame({
+    '項目': ['パッチサイズ', '埋め込み次元', 'Transformer層数', 'アテンションヘッド数', '最大シーケンス長'],
+    '値': ['32x32ピクセル', '768', '12', '12', '512']
+}).set_index('項目')
+_PERF_TABLE = pd.DataFrame({
+    '処理ステップ': ['画像読み込み', 'ViT処理', 'CLIPマッチング', '後処理', '合計'],
+    '時間': ['~100ms', '~500ms', '~200ms', '~50ms', '~850ms']
+}).set_index('処理ステップ')
+
+
+def _rect_vertices(x0, y0, width: float, height: float) -> np.ndarray:
+    """
+    左下の座標の配列から、同じ大きさの矩形の頂点配列を作成します
+    
+    Args:
+        x0: 左下のx座標（スカラーまたは配列）
+        y0: 左下のy座標（スカラーまたは配列）
+        width: 矩形の幅
+        height: 矩形の高さ
+        
+    Returns:
+        頂点配列 (N, 4, 2)
+    """
+    x0, y0 = np.broadcast_arrays(np.asarray(x0, dtype=float), np.asarray(y0, dtype=float))
+    origins = np.stack([x0.ravel(), y0.ravel()], axis=-1)
+    corners = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=float) * [width, height]
+    return origins[:, None, :] + corners
+
+
+# 詳細フロー図で繰り返し描く矩形の頂点（座標は固定のため読み込み時に一度だけ計算する）
+_grid_i, _grid_j = np.mgrid[:4, :4]
+_PATCH_GRID_VERTS = _rect_vertices(3 + _grid_i * 0.5, 1.5 + _grid_j * 0.3, 0.4, 0.25)
+_EMBEDDING_VERTS = _rect_vertices(1, 4 - np.arange(6) * 0.5, 2, 0.4)
+_LAYER_VERTS = _rect_vertices(6, 4.5 - np.arange(4) * 0.8, 2, 0.6)
+
+# 基本フロー図の各ステップ (x, y, 枠線の色, 塗りつぶしの色, アイコン, ラベル, 補足)
+_STEP_SPECS = (
+    (1, 6, '#007bff', '#e3f2fd', '📷', '画像入力', 'RGB画像'),
+    (3, 6, '#28a745', '#e8f5e8', '🔲', 'ViTトークン化', 'パッチ分割'),
+    (5, 6, '#ffc107', '#fff8e1', '🎯', 'スコアマップ', '信頼度スコア'),
+    (7, 6, '#dc3545', '#fce4ec', '📍', '検出結果', 'バウンディングボックス'),
+)
 
 
 class OWLViTVisualizer:
     """OWL-ViTの処理フローを可視化するクラス"""
     
-    def __init__(self):
-        """可視化クラスの初期化"""
-        # 日本語フォントの設定
-        plt.rcParams['font.family'] = ['DejaVu Sans', 'Hiragino Sans', 'Yu Gothic', 'Meiryo', 'Takao', 'IPAexGothic', 'IPAPGothic', 'VL PGothic', 'Noto Sans CJK JP']
-    
     @staticmethod
-    def create_processing_flow_diagram() -> plt.Figure:
+    def create_processing_flow_diagram() -> Figure:
         """
         OWL-ViTの処理フロー図を作成します
         
+        pyplotを介さずにFigureを作成するため、pyplotのグローバルなFigure管理には登録されません。
+        
         Returns:
             処理フロー図のmatplotlib Figure
         """
-        fig, ax = plt.subplots(1, 1, figsize=(12, 8))
+        fig = Figure(figsize=(12, 8))
+        ax = fig.subplots()
         ax.set_xlim(0, 10)
         ax.set_ylim(0, 8)
         ax.axis('off')
@@ -37,20 +101,11 @@ class OWLViTVisualizer:
         # 背景色
         ax.set_facecolor('#f8f9fa')
         
-        # ステップ1: 画像入力
-        self._draw_image_input_step(ax, 1, 6)
-        
-        # ステップ2: ViTトークン化
-        self._draw_vit_tokenization_step(ax, 3, 6)
-        
-        # ステップ3: スコアマップ生成
-        self._draw_score_map_step(ax, 5, 6)
-        
-        # ステップ4: 検出結果
-        self._draw_detection_step(ax, 7, 6)
+        # 各ステップ（画像入力→ViTトークン化→スコアマップ生成→検出結果）
+        OWLViTVisualizer._draw_steps(ax, _STEP_SPECS)
         
         # 矢印で接続
-        self._draw_arrows(ax)
+        OWLViTVisualizer._draw_arrows(ax)
         
         # タイトル
         ax.text(5, 7.5, '🦉 OWL-ViT 処理フロー', 
@@ -60,95 +115,85 @@ class OWLViTVisualizer:
         return fig
     
     @staticmethod
-    def _draw_image_input_step(ax, x: float, y: float):
-        """画像入力ステップを描画"""
-        # 画像の枠
-        rect = patches.Rectangle((x-0.8, y-0.6), 1.6, 1.2, 
-                               linewidth=2, edgecolor='#007bff', facecolor='#e3f2fd')
-        ax.add_patch(rect)
-        
-        # 画像アイコン
-        ax.text(x, y+0.1, '📷', fontsize=24, ha='center')
-        
-        # ラベル
-        ax.text(x, y-0.8, '画像入力', fontsize=12, fontweight='bold', ha='center')
-        ax.text(x, y-1.0, 'RGB画像', fontsize=10, ha='center', color='#666')
-    
-    @staticmethod
-    def _draw_vit_tokenization_step(ax, x: float, y: float):
-        """ViTトークン化ステップを描画"""
-        # トークンの枠
-        rect = patches.Rectangle((x-0.8, y-0.6), 1.6, 1.2, 
-                               linewidth=2, edgecolor='#28a745', facecolor='#e8f5e8')
-        ax.add_patch(rect)
-        
-        # トークンアイコン
-        ax.text(x, y+0.1, '🔲', fontsize=24, ha='center')
-        
-        # ラベル
-        ax.text(x, y-0.8, 'ViTトークン化', fontsize=12, fontweight='bold', ha='center')
-        ax.text(x, y-1.0, 'パッチ分割', fontsize=10, ha='center', color='#666')
-    
-    @staticmethod
-    def _draw_score_map_step(ax, x: float, y: float):
-        """スコアマップ生成ステップを描画"""
-        # スコアマップの枠
-        rect = patches.Rectangle((x-0.8, y-0.6), 1.6, 1.2, 
-                               linewidth=2, edgecolor='#ffc107', facecolor='#fff8e1')
-        ax.add_patch(rect)
-        
-        # スコアマップアイコン
-        ax.text(x, y+0.1, '🎯', fontsize=24, ha='center')
-        
-        # ラベル
-        ax.text(x, y-0.8, 'スコアマップ', fontsize=12, fontweight='bold', ha='center')
-        ax.text(x, y-1.0, '信頼度スコア', fontsize=10, ha='center', color='#666')
+    def _draw_steps(ax, specs) -> None:
+        """
+        処理ステップの枠とラベルを描画します
+        
+        Args:
+            ax: 描画先のAxes
+            specs: (x, y, 枠線の色, 塗りつぶしの色, アイコン, ラベル, 補足) のシーケンス
+        """
+        # 各ステップの枠を1つのコレクションとしてまとめて追加する
+        rects = [patches.Rectangle((x-0.8, y-0.6), 1.6, 1.2) for x, y, *_ in specs]
+        collection = PatchCollection(rects, linewidth=2)
+        collection.set_edgecolor([spec[2] for spec in specs])
+        collection.set_facecolor([spec[3] for spec in specs])
+        ax.add_collection(collection, autolim=False)
+        
+        for x, y, _, _, icon, label, caption in specs:
+            # アイコン
+            ax.text(x, y+0.1, icon, fontsize=24, ha='center')
+            
+            # ラベル
+            ax.text(x, y-0.8, label, fontsize=12, fontweight='bold', ha='center')
+            ax.text(x, y-1.0, caption, fontsize=10, ha='center', color='#666')
     
     @staticmethod
-    def _draw_detection_step(ax, x: float, y: float):
-        """検出結果ステップを描画"""
-        # 検出結果の枠
-        rect = patches.Rectangle((x-0.8, y-0.6), 1.6, 1.2, 
-                               linewidth=2, edgecolor='#dc3545', facecolor='#fce4ec')
-        ax.add_patch(rect)
-        
-        # 検出アイコン
-        ax.text(x, y+0.1, '📍', fontsize=24, ha='center')
-        
-        # ラベル
-        ax.text(x, y-0.8, '検出結果', fontsize=12, fontweight='bold', ha='center')
-        ax.text(x, y-1.0, 'バウンディングボックス', fontsize=10, ha='center', color='#666')
+    def _draw_arrow_lines(ax, segments, color: str = 'black', linewidth: float = 2, head_length: float = 0.12) -> None:
+        """
+        矢印をまとめて描画します
+        
+        矢印ごとにFancyArrowPatchを作らず、軸と矢じりの線分を1つのLineCollectionとして追加します。
+        
+        Args:
+            ax: 描画先のAxes
+            segments: ((始点x, 始点y), (終点x, 終点y)) のシーケンス
+            color: 線の色
+            linewidth: 線の太さ
+            head_length: 矢じりの長さ（データ座標）
+        """
+        shafts = np.asarray(segments, dtype=float)
+        start, end = shafts[:, 0], shafts[:, 1]
+        direction = end - start
+        direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+        # 矢じりの根元と、進行方向に垂直な広がり
+        base = end - direction * head_length
+        spread = direction[:, ::-1] * np.array([-1.0, 1.0]) * head_length * 0.6
+        lines = np.concatenate([
+            shafts,
+            np.stack([base + spread, end], axis=1),
+            np.stack([base - spread, end], axis=1)
+        ])
+        ax.add_collection(
+            LineCollection(lines, colors=color, linewidths=linewidth, capstyle='round'),
+            autolim=False
+        )
     
     @staticmethod
     def _draw_arrows(ax):
         """矢印を描画"""
-        # ステップ間の矢印
-        arrow_props = dict(arrowstyle='->', lw=2, color='#333')
-        
-        # 画像→ViT
-        ax.annotate('', xy=(2.2, 6), xytext=(1.8, 6), arrowprops=arrow_props)
-        ax.text(2.0, 6.3, 'Vision\nTransformer', fontsize=9, ha='center', 
-               bbox=dict(boxstyle="round,pad=0.2", facecolor='white', alpha=0.8))
-        
-        # ViT→スコアマップ
-        ax.annotate('', xy=(4.2, 6), xytext=(3.8, 6), arrowprops=arrow_props)
-        ax.text(4.0, 6.3, 'CLIP\nマッチング', fontsize=9, ha='center',
-               bbox=dict(boxstyle="round,pad=0.2", facecolor='white', alpha=0.8))
-        
-        # スコアマップ→検出
-        ax.annotate('', xy=(6.2, 6), xytext=(5.8, 6), arrowprops=arrow_props)
-        ax.text(6.0, 6.3, '後処理\nNMS', fontsize=9, ha='center',
-               bbox=dict(boxstyle="round,pad=0.2", facecolor='white', alpha=0.8))
+        # ステップ間の矢印（画像→ViT、ViT→スコアマップ、スコアマップ→検出）
+        OWLViTVisualizer._draw_arrow_lines(
+            ax, [((1.8, 6), (2.2, 6)), ((3.8, 6), (4.2, 6)), ((5.8, 6), (6.2, 6))], color='#333'
+        )
+        
+        # 矢印のラベル
+        ax.text(2.0, 6.3, 'Vision\nTransformer', fontproperties=_FP_CAPTION, ha='center', bbox=_BOX_WHITE)
+        ax.text(4.0, 6.3, 'CLIP\nマッチング', fontproperties=_FP_CAPTION, ha='center', bbox=_BOX_WHITE)
+        ax.text(6.0, 6.3, '後処理\nNMS', fontproperties=_FP_CAPTION, ha='center', bbox=_BOX_WHITE)
     
     @staticmethod
-    def create_detailed_flow_diagram() -> plt.Figure:
+    def create_detailed_flow_diagram() -> Figure:
         """
         詳細な処理フロー図を作成します
         
         Returns:
             詳細な処理フロー図のmatplotlib Figure
         """
-        fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+        fig = Figure(figsize=(16, 12))
+        axes = fig.subplots(2, 2)
+        # レイアウトは固定のため、全テキストを計測するtight_layoutは使わず余白を直接指定する
+        fig.subplots_adjust(left=0.04, right=0.98, top=0.92, bottom=0.04, wspace=0.08, hspace=0.18)
         fig.suptitle('🦉 OWL-ViT 詳細処理フロー', fontsize=20, fontweight='bold')
         
         # サブプロット1: 画像前処理
@@ -167,7 +212,6 @@ class OWLViTVisualizer:
         ax4 = axes[1, 1]
         OWLViTVisualizer._draw_detection_postprocessing(ax4)
         
-        plt.tight_layout()
         return fig
     
     @staticmethod
@@ -184,7 +228,7 @@ class OWLViTVisualizer:
         ax.add_patch(rect1)
         
         # リサイズ
-        ax.annotate('', xy=(4.5, 5.25), xytext=(3.5, 5.25), arrowprops=dict(arrowstyle='->', lw=2))
+        OWLViTVisualizer._draw_arrow_lines(ax, [((3.5, 5.25), (4.5, 5.25))])
         ax.text(4, 5.5, 'リサイズ', fontsize=10, ha='center')
         
         # 正規化画像
@@ -192,13 +236,12 @@ class OWLViTVisualizer:
         rect2 = patches.Rectangle((6, 4.5), 2, 1.5, linewidth=2, edgecolor='green', facecolor='lightgreen')
         ax.add_patch(rect2)
         
-        # パッチ分割
+        # パッチ分割（16個の矩形を頂点配列から1つのコレクションとしてまとめて追加する）
         ax.text(4.5, 3, 'パッチ分割', fontsize=12, ha='center')
-        for i in range(4):
-            for j in range(4):
-                rect = patches.Rectangle((3+i*0.5, 1.5+j*0.3), 0.4, 0.25, 
-                                       linewidth=1, edgecolor='red', facecolor='lightcoral')
-                ax.add_patch(rect)
+        ax.add_collection(
+            PolyCollection(_PATCH_GRID_VERTS, linewidths=1, edgecolors='red', facecolors='lightcoral'),
+            autolim=False
+        )
     
     @staticmethod
     def _draw_vit_processing(ax):
@@ -210,19 +253,22 @@ class OWLViTVisualizer:
         
         # パッチ埋め込み
         ax.text(2, 6, 'パッチ埋め込み', fontsize=12, ha='center')
-        for i in range(6):
-            rect = patches.Rectangle((1, 4-i*0.5), 2, 0.4, linewidth=1, edgecolor='purple', facecolor='lavender')
-            ax.add_patch(rect)
+        ax.add_collection(
+            PolyCollection(_EMBEDDING_VERTS, linewidths=1, edgecolors='purple', facecolors='lavender'),
+            autolim=False
+        )
         
         # 位置エンコーディング
-        ax.annotate('', xy=(4.5, 2), xytext=(3.5, 2), arrowprops=dict(arrowstyle='->', lw=2))
+        OWLViTVisualizer._draw_arrow_lines(ax, [((3.5, 2), (4.5, 2))])
         ax.text(4, 2.3, '+位置エンコーディング', fontsize=10, ha='center')
         
         # Transformer層
         ax.text(7, 6, 'Transformer層', fontsize=12, ha='center')
+        ax.add_collection(
+            PolyCollection(_LAYER_VERTS, linewidths=1, edgecolors='orange', facecolors='moccasin'),
+            autolim=False
+        )
         for i in range(4):
-            rect = patches.Rectangle((6, 4.5-i*0.8), 2, 0.6, linewidth=1, edgecolor='orange', facecolor='moccasin')
-            ax.add_patch(rect)
             ax.text(7, 4.2-i*0.8, f'Layer {i+1}', fontsize=8, ha='center')
     
     @staticmethod
@@ -247,8 +293,7 @@ class OWLViTVisualizer:
         
         # 類似度計算
         ax.text(4.5, 2, '類似度計算\n(コサイン類似度)', fontsize=12, ha='center')
-        ax.annotate('', xy=(4.5, 3), xytext=(3, 4.75), arrowprops=dict(arrowstyle='->', lw=2))
-        ax.annotate('', xy=(4.5, 3), xytext=(7, 4.75), arrowprops=dict(arrowstyle='->', lw=2))
+        OWLViTVisualizer._draw_arrow_lines(ax, [((3, 4.75), (4.5, 3)), ((7, 4.75), (4.5, 3))])
         
         # スコアマップ
         ax.text(4.5, 0.5, 'スコアマップ', fontsize=12, ha='center')
@@ -269,7 +314,7 @@ class OWLViTVisualizer:
         ax.add_patch(rect1)
         
         # 閾値処理
-        ax.annotate('', xy=(4.5, 4.75), xytext=(3.5, 4.75), arrowprops=dict(arrowstyle='->', lw=2))
+        OWLViTVisualizer._draw_arrow_lines(ax, [((3.5, 4.75), (4.5, 4.75))])
         ax.text(4, 5, '閾値処理', fontsize=10, ha='center')
         
         # 候補領域
@@ -278,7 +323,7 @@ class OWLViTVisualizer:
         ax.add_patch(rect2)
         
         # NMS
-        ax.annotate('', xy=(4.5, 2), xytext=(7, 4.75), arrowprops=dict(arrowstyle='->', lw=2))
+        OWLViTVisualizer._draw_arrow_lines(ax, [((7, 4.75), (4.5, 2))])
         ax.text(4.5, 2.3, 'NMS\n(Non-Maximum Suppression)', fontsize=10, ha='center')
         
         # 最終結果
@@ -288,32 +333,31 @@ class OWLViTVisualizer:
         ax.text(4.5, 0, 'バウンディングボックス', fontsize=8, ha='center')
     
     @staticmethod
-    def create_interactive_flow_diagram() -> plt.Figure:
+    @st.cache_resource(show_spinner=False)
+    def create_interactive_flow_diagram() -> go.Figure:
         """
-        インタラクティブな処理フロー図を作成します
+        インタラクティブな処理フロー図を作成します（キャッシュ付き）
+        
+        ブラウザ側で描画されるPlotlyの図として作成するため、サーバーでのラスタライズは行いません。
         
         Returns:
-            インタラクティブな処理フロー図のmatplotlib Figure
+            インタラクティブな処理フロー図のPlotly Figure
         """
-        fig, ax = plt.subplots(1, 1, figsize=(14, 10))
-        ax.set_xlim(0, 12)
-        ax.set_ylim(0, 10)
-        ax.axis('off')
-        
-        # 背景
-        ax.set_facecolor('#f8f9fa')
+        shapes = []
+        annotations = []
         
         # メインタイトル
-        ax.text(6, 9.5, '🦉 OWL-ViT インタラクティブ処理フロー', 
-                fontsize=18, fontweight='bold', ha='center',
-                bbox=dict(boxstyle="round,pad=0.5", facecolor='white', alpha=0.9))
+        annotations.append(dict(
+            x=6, y=9.5, text='<b>🦉 OWL-ViT インタラクティブ処理フロー</b>',
+            font=dict(size=22), bgcolor='rgba(255, 255, 255, 0.9)', borderpad=8
+        ))
         
         # 各ステップの詳細説明付き図
         steps = [
-            {'pos': (2, 7), 'title': '📷 画像入力', 'desc': 'RGB画像\nサイズ調整\n正規化'},
-            {'pos': (4, 7), 'title': '🔲 ViT処理', 'desc': 'パッチ分割\n位置エンコーディング\nTransformer層'},
-            {'pos': (6, 7), 'title': '🎯 CLIPマッチング', 'desc': 'テキスト特徴量\n画像特徴量\n類似度計算'},
-            {'pos': (8, 7), 'title': '📍 検出結果', 'desc': 'スコアマップ\n閾値処理\nNMS処理'}
+            {'pos': (2, 7), 'title': '📷 画像入力', 'desc': 'RGB画像<br>サイズ調整<br>正規化'},
+            {'pos': (4, 7), 'title': '🔲 ViT処理', 'desc': 'パッチ分割<br>位置エンコーディング<br>Transformer層'},
+            {'pos': (6, 7), 'title': '🎯 CLIPマッチング', 'desc': 'テキスト特徴量<br>画像特徴量<br>類似度計算'},
+            {'pos': (8, 7), 'title': '📍 検出結果', 'desc': 'スコアマップ<br>閾値処理<br>NMS処理'}
         ]
         
         colors = ['#007bff', '#28a745', '#ffc107', '#dc3545']
@@ -322,29 +366,38 @@ class OWLViTVisualizer:
             x, y = step['pos']
             
             # ステップボックス
-            rect = patches.Rectangle((x-0.8, y-0.8), 1.6, 1.6, 
-                                   linewidth=3, edgecolor=colors[i], facecolor='white', alpha=0.8)
-            ax.add_patch(rect)
+            shapes.append(dict(
+                type='rect', x0=x-0.8, y0=y-0.8, x1=x+0.8, y1=y+0.8,
+                line=dict(color=colors[i], width=3), fillcolor='white', opacity=0.8, layer='below'
+            ))
             
             # タイトル
-            ax.text(x, y+0.3, step['title'], fontsize=12, fontweight='bold', ha='center')
+            annotations.append(dict(
+                x=x, y=y+0.3, text=f"<b>{step['title']}</b>", font=dict(size=14), yanchor='bottom'
+            ))
             
             # 説明
-            ax.text(x, y-0.2, step['desc'], fontsize=9, ha='center', va='top')
+            annotations.append(dict(
+                x=x, y=y-0.2, text=step['desc'], font=dict(size=11), yanchor='top'
+            ))
         
         # 矢印と詳細説明
         arrows = [
-            {'start': (2.8, 7), 'end': (3.2, 7), 'desc': 'Vision\nTransformer'},
-            {'start': (4.8, 7), 'end': (5.2, 7), 'desc': 'CLIP\nマッチング'},
-            {'start': (6.8, 7), 'end': (7.2, 7), 'desc': '後処理\nNMS'}
+            {'start': (2.8, 7), 'end': (3.2, 7), 'desc': 'Vision<br>Transformer'},
+            {'start': (4.8, 7), 'end': (5.2, 7), 'desc': 'CLIP<br>マッチング'},
+            {'start': (6.8, 7), 'end': (7.2, 7), 'desc': '後処理<br>NMS'}
         ]
         
         for arrow in arrows:
-            ax.annotate('', xy=arrow['end'], xytext=arrow['start'], 
-                       arrowprops=dict(arrowstyle='->', lw=3, color='#333'))
-            ax.text((arrow['start'][0] + arrow['end'][0])/2, arrow['start'][1] + 0.5, 
-                   arrow['desc'], fontsize=9, ha='center',
-                   bbox=dict(boxstyle="round,pad=0.2", facecolor='white', alpha=0.8))
+            annotations.append(dict(
+                x=arrow['end'][0], y=arrow['end'][1], ax=arrow['start'][0], ay=arrow['start'][1],
+                axref='x', ayref='y', text='', showarrow=True,
+                arrowhead=2, arrowwidth=3, arrowcolor='#333'
+            ))
+            annotations.append(dict(
+                x=(arrow['start'][0] + arrow['end'][0])/2, y=arrow['start'][1] + 0.5,
+                text=arrow['desc'], font=dict(size=11), yanchor='bottom', **_PLOTLY_BOX_WHITE
+            ))
         
         # 技術詳細
         details = [
@@ -355,9 +408,11 @@ class OWLViTVisualizer:
             '• 最大シーケンス長: 512'
         ]
         
-        for i, detail in enumerate(details):
-            ax.text(1, 4-i*0.5, detail, fontsize=10, ha='left',
-                   bbox=dict(boxstyle="round,pad=0.2", facecolor='#e9ecef', alpha=0.8))
+        # 行ごとに注釈を作らず、複数行のテキストを1つの注釈として配置する
+        annotations.append(dict(
+            x=1, y=4.3, text='<br>'.join(details), font=dict(size=12), align='left',
+            xanchor='left', yanchor='top', **_PLOTLY_BOX_GRAY
+        ))
         
         # 処理時間目安
         timing_info = [
@@ -369,16 +424,114 @@ class OWLViTVisualizer:
             '• 合計: ~850ms'
         ]
         
-        for i, info in enumerate(timing_info):
-            ax.text(8, 4-i*0.4, info, fontsize=10, ha='left',
-                   bbox=dict(boxstyle="round,pad=0.2", facecolor='#e9ecef', alpha=0.8))
-        
+        annotations.append(dict(
+            x=8, y=4.3, text='<br>'.join(timing_info), font=dict(size=12), align='left',
+            xanchor='left', yanchor='top', **_PLOTLY_BOX_GRAY
+        ))
+        
+        # 図形と注釈は一度にまとめてレイアウトへ渡す
+        for annotation in annotations:
+            annotation.setdefault('showarrow', False)
+        fig = go.Figure()
+        fig.update_layout(
+            shapes=shapes,
+            annotations=annotations,
+            xaxis=dict(range=[0, 12], visible=False, fixedrange=True),
+            yaxis=dict(range=[0, 10], visible=False, fixedrange=True),
+            plot_bgcolor='#f8f9fa',
+            height=700,
+            margin=dict(l=10, r=10, t=10, b=10),
+            showlegend=False
+        )
         return fig
 
 
 class FlowVisualizationManager:
     """処理フローの可視化を管理するクラス"""
     
+    # 可視化タイプごとのmatplotlibの図の作成関数とファイル名に使う識別子
+    FLOW_DIAGRAMS = {
+        "基本フロー図": (OWLViTVisualizer.create_processing_flow_diagram, "basic"),
+        "詳細フロー図": (OWLViTVisualizer.create_detailed_flow_diagram, "detailed"),
+    }
+    
+    # 画面表示用とダウンロード用の解像度（事前に描画する図も画面表示用の解像度で保存する）
+    PREVIEW_DPI = 72
+    EXPORT_DPI = 200
+    
+    # 事前に描画した図（scripts/build_flow_assets.pyで作成）の保存先
+    ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+    
+    @staticmethod
+    def asset_path(viz_type: str) -> str:
+        """
+        事前に描画した処理フロー図のパスを返します
+        
+        Args:
+            viz_type: 可視化タイプ
+            
+        Returns:
+            PNGファイルのパス
+        """
+        _, name = FlowVisualizationManager.FLOW_DIAGRAMS[viz_type]
+        return os.path.join(FlowVisualizationManager.ASSET_DIR, f"flow_{name}.png")
+    
+    @staticmethod
+    @st.cache_resource(show_spinner=False)
+    def _flow_png(viz_type: str, dpi: int) -> bytes:
+        """
+        処理フロー図をPNG形式で描画します（キャッシュ付き）
+        
+        入力に依存しない静的な図のため、一度だけ描画したバイト列を再実行のたびに再利用します。
+        
+        Args:
+            viz_type: 可視化タイプ
+            dpi: 描画する解像度
+            
+        Returns:
+            PNG形式のバイト列
+        """
+        build_figure, _ = FlowVisualizationManager.FLOW_DIAGRAMS[viz_type]
+        fig = build_figure()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        return buffer.getvalue()
+    
+    @staticmethod
+    def _display_flow_image(viz_type: str) -> None:
+        """
+        処理フロー図を表示し、高解像度版のダウンロードを提供します
+        
+        Args:
+            viz_type: 可視化タイプ
+        """
+        # 事前に描画した図（assets/）をmatplotlibを使わずにそのまま表示する
+        # （OWLVIT_REBUILD_FLOWが設定されている場合のみ、その場で描画し直す）
+        asset = FlowVisualizationManager.asset_path(viz_type)
+        rebuild = bool(os.environ.get("OWLVIT_REBUILD_FLOW"))
+        if not rebuild and os.path.exists(asset):
+            st.image(asset, use_container_width=True)
+        else:
+            if not rebuild:
+                st.warning(
+                    f"事前に描画した図が見つからないため、その場で描画します: {asset}\n"
+                    "scripts/build_flow_assets.py を実行して図を作成してください"
+                )
+            # 画面には解像度を抑えたプレビューを送り、高解像度版は求められたときだけ描画する
+            st.image(
+                FlowVisualizationManager._flow_png(viz_type, FlowVisualizationManager.PREVIEW_DPI),
+                use_container_width=True
+            )
+        
+        if st.checkbox("高解像度PNGを用意する", key=f"flow_hires_{viz_type}"):
+            _, name = FlowVisualizationManager.FLOW_DIAGRAMS[viz_type]
+            st.download_button(
+                label="高解像度PNGをダウンロード",
+                data=FlowVisualizationManager._flow_png(viz_type, FlowVisualizationManager.EXPORT_DPI),
+                file_name=f"owl_vit_flow_{name}.png",
+                mime="image/png"
+            )
+    
     @staticmethod
     def display_flow_visualization() -> None:
         """処理フローの可視化を表示します"""
@@ -392,8 +545,7 @@ class FlowVisualizationManager:
         )
         
         if viz_type == "基本フロー図":
-            fig = OWLViTVisualizer.create_processing_flow_diagram()
-            st.pyplot(fig)
+            FlowVisualizationManager._display_flow_image(viz_type)
             
             st.markdown("""
             **基本フロー図の説明:**
@@ -404,8 +556,7 @@ class FlowVisualizationManager:
             """)
             
         elif viz_type == "詳細フロー図":
-            fig = OWLViTVisualizer.create_detailed_flow_diagram()
-            st.pyplot(fig)
+            FlowVisualizationManager._display_flow_image(viz_type)
             
             st.markdown("""
             **詳細フロー図の説明:**
@@ -431,8 +582,8 @@ class FlowVisualizationManager:
             """)
             
         elif viz_type == "インタラクティブフロー図":
-            fig = OWLViTVisualizer.create_interactive_flow_diagram()
-            st.pyplot(fig)
+            # ブラウザ側で描画する
+            st.plotly_chart(OWLViTVisualizer.create_interactive_flow_diagram(), use_container_width=True)
             
             st.markdown("""
             **インタラクティブフロー図の説明:**
@@ -441,12 +592,8 @@ class FlowVisualizationManager:
             各ステップの処理内容と技術仕様、処理時間の目安を確認できます。
             
             **技術仕様:**
-            - パッチサイズ: 32x32ピクセル
-            - 埋め込み次元: 768
-            - Transformer層数: 12
-            - アテンションヘッド数: 12
-            - 最大シーケンス長: 512
             """)
+            st.table(_SPEC_TABLE)
         
         # 技術的な詳細情報
         with st.expander("🔧 技術的な詳細"):
@@ -477,17 +624,10 @@ class FlowVisualizationManager:
         
         # パフォーマンス情報
         with st.expander("⚡ パフォーマンス情報"):
-            st.markdown("""
-            **処理時間の目安 (GPU使用時):**
-            
-            | 処理ステップ | 時間 |
-            |-------------|------|
-            | 画像読み込み | ~100ms |
-            | ViT処理 | ~500ms |
-            | CLIPマッチング | ~200ms |
-            | 後処理 | ~50ms |
-            | **合計** | **~850ms** |
+            st.markdown("**処理時間の目安 (GPU使用時):**")
+            st.table(_PERF_TABLE)
             
+            st.markdown("""
             **メモリ使用量:**
             - モデルサイズ: ~1GB
             - 推論時のメモリ: ~2-4GB